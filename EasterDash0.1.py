@@ -12,26 +12,106 @@ from dash import (
     MATCH,
     callback_context,
     ALL,
+    Patch,
 )
 
+from dash.development.base_component import Component
 from dash.exceptions import PreventUpdate
 from dash import ClientsideFunction
-import plotly.express as px
-import pandas as pd
 import os
-from flask import request, make_response
-import mysql.connector
+import csv
+import io
+import json
+import logging
+import queue
+import threading
+from logging.handlers import QueueHandler, QueueListener
+from flask import g, request, make_response
 
 # auth_setup.py (optional) or top of app.py
 import os
 from functools import wraps
 from flask import redirect, session, url_for, request
-from authlib.integrations.flask_client import OAuth
+from flask import Response, jsonify, stream_with_context
 from dotenv import load_dotenv
-from sqlalchemy import create_engine
-
-DATABASE_URL = os.getenv("DATABASE_URL")
-engine = create_engine(DATABASE_URL)
+from plotly.io.json import to_json_plotly
+from sqlalchemy import text
+
+import cube
+import events
+import figure_cache
+import metrics
+import shared_cache
+import time_buckets
+from aggregates import (
+    counters_version,
+    get_counters,
+    peek_total,
+    rebuild_counters,
+    record_submissions,
+)
+from db import engine, pool_status
+from geo import (
+    US_STATE_NAMES,
+    get_country_list,
+    get_state_options,
+    start_background_refresh,
+)
+from schema import ensure_schema
+from submissions import MAX_LENGTHS, build_row, invalid_values, missing_fields
+from table_query import fetch_page
+from write_queue import configure as configure_write_queue
+from write_queue import submit as queue_submission
+
+# LOG_LEVEL sets how much is logged (DEBUG shows every form submission and
+# cookie change); LOG_LEVEL=OFF turns logging off. Records are written to
+# stderr by a background thread, so requests don't wait on the terminal.
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+if LOG_LEVEL == "OFF":
+    logging.disable(logging.CRITICAL)
+else:
+    log_queue = queue.SimpleQueue()
+    log_output = logging.StreamHandler()
+    log_output.setFormatter(
+        logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s")
+    )
+    log_handler = QueueHandler(log_queue)
+    log_handler.setFormatter(logging.Formatter("%(message)s"))
+    logging.basicConfig(level=LOG_LEVEL, handlers=[log_handler])
+    log_listener = QueueListener(log_queue, log_output)
+    log_listener.start()
+
+    # A forked process (a worker of a preloaded app, see wsgi.py, or a
+    # background chart job) has no listener thread, so it logs straight to
+    # stderr until it serves a request (start_process_threads).
+    def log_directly():
+        logging.getLogger().removeHandler(log_handler)
+        logging.getLogger().addHandler(log_output)
+
+    os.register_at_fork(after_in_child=log_directly)
+    # SQLAlchemy's own debug output is too chatty to follow LOG_LEVEL. Its
+    # pool logger is named after the pool class, which lives in db.py.
+    for name in ("sqlalchemy", "db.TimedQueuePool"):
+        logging.getLogger(name).setLevel(logging.WARNING)
+logger = logging.getLogger("easterdash")
+
+metrics.instrument_engine(engine)
+
+try:
+    ensure_schema(engine)
+except Exception:
+    logger.exception("Schema update failed")
+
+
+def record_flushed(rows):
+    record_submissions(rows)
+    for row in rows:
+        cube.record_submission(row)
+
+
+configure_write_queue(
+    engine, on_flush=record_flushed, on_insert=time_buckets.add_rows
+)
 
 AUTH0_CLIENT_ID = os.environ.get("AUTH0_CLIENT_ID", "your-client-id")
 AUTH0_CLIENT_SECRET = os.environ.get(
@@ -60,18 +140,28 @@ def is_admin_user():
     return user_email in [email.strip().lower() for email in allowed_admins]
 
 
-# O Auth integration
-oauth = OAuth()
-auth0 = oauth.register(
-    "auth0",
-    client_id=os.getenv("AUTH0_CLIENT_ID"),
-    client_secret=os.getenv("AUTH0_CLIENT_SECRET"),
-    api_base_url=f"https://{os.getenv('AUTH0_DOMAIN')}",
-    access_token_url=f"https://{os.getenv('AUTH0_DOMAIN')}/oauth/token",
-    authorize_url=f"https://{os.getenv('AUTH0_DOMAIN')}/authorize",
-    client_kwargs={"scope": "openid profile email"},
-    server_metadata_url=f"https://{os.getenv('AUTH0_DOMAIN')}/.well-known/openid-configuration",
-)
+# O Auth integration. Registered on first use, so authlib is only imported
+# once someone logs in.
+_auth0 = None
+
+
+def get_auth0():
+    global _auth0
+    if _auth0 is None:
+        from authlib.integrations.flask_client import OAuth
+
+        oauth = OAuth(server)
+        _auth0 = oauth.register(
+            "auth0",
+            client_id=os.getenv("AUTH0_CLIENT_ID"),
+            client_secret=os.getenv("AUTH0_CLIENT_SECRET"),
+            api_base_url=f"https://{os.getenv('AUTH0_DOMAIN')}",
+            access_token_url=f"https://{os.getenv('AUTH0_DOMAIN')}/oauth/token",
+            authorize_url=f"https://{os.getenv('AUTH0_DOMAIN')}/authorize",
+            client_kwargs={"scope": "openid profile email"},
+            server_metadata_url=f"https://{os.getenv('AUTH0_DOMAIN')}/.well-known/openid-configuration",
+        )
+    return _auth0
 
 
 # Redirects if Oauth
@@ -86,6 +176,8 @@ def requires_auth(f):
 
 
 CSV_PATH = os.path.join(os.path.dirname(__file__), "responses.csv")
+DOWNLOAD_URL = "/download/responses.csv"
+DOWNLOAD_CHUNK_ROWS = 1000
 columns = [
     "Name",
     "Age Range",
@@ -96,22 +188,47 @@ columns = [
     "Christ Follower",
     "Faith Decicion",
     "How you found us?",
+    "Submitted At",
 ]
 
-df = pd.DataFrame()
-current_chart = "local"
-
-def load_df():
-    with engine.connect() as conn:
-        return pd.read_sql("SELECT * FROM responses", conn)
-    
-df = load_df()
-
+# Open dashboards check for new responses this often (0 turns it off); see
+# live_responses.
+LIVE_POLL_SECONDS = float(os.getenv("LIVE_POLL_SECONDS", "5"))
+LIVE_URL = "/live/responses"
+
+# Every chart graph on the page (see chart_graph), and the state map's.
+CHART_GRAPHS = {"type": "chart-graph", "chart": ALL, "index": ALL}
+STATE_MAP = {"type": "chart-graph", "chart": "state_map", "index": 0}
+
+
+# Chart callbacks run on the request thread unless BACKGROUND_CHARTS=true,
+# the opt-in non-blocking path: they then run as Dash background callbacks
+# in a separate process, so a slow query shows the loading spinner without
+# holding up a web worker. Needs dash[diskcache], and a shared
+# CACHE_BACKEND (see shared_cache.py): each job runs in a new process, which
+# with the memory backend would load the counts and build the chart again
+# for every click and then throw them away.
+BACKGROUND_CHARTS = os.getenv("BACKGROUND_CHARTS", "false").lower() == "true"
+background_callback_manager = None
+if BACKGROUND_CHARTS:
+    if not shared_cache.SHARED:
+        raise RuntimeError(
+            "BACKGROUND_CHARTS=true needs CACHE_BACKEND=filesystem or redis"
+        )
+    import diskcache
+    from dash import DiskcacheManager
 
+    background_callback_manager = DiskcacheManager(
+        diskcache.Cache(os.getenv("BACKGROUND_CACHE_DIR", "./cache"))
+    )
 
-app = Dash(__name__, routes_pathname_prefix="/")
+app = Dash(
+    __name__,
+    routes_pathname_prefix="/",
+    background_callback_manager=background_callback_manager,
+)
 server = app.server
-oauth.init_app(server)
+metrics.instrument_server(server)
 app.server.secret_key = os.getenv("FLASK_SECRET_KEY", "super-secret-dev-key")
 app.title = "Pydash Dashboard"
 prevent_initial_call = "initial_duplicate"
@@ -121,71 +238,93 @@ app.config.suppress_callback_exceptions = True
 
 app.layout = lambda: render_layout_with_cookie()
 
-from urllib.parse import urlparse, parse_qs
+
+# Only the submission-store and logged-in values depend on the request, so
+# the rest of the page shell is built once and shared.
+LAYOUT_HEAD = [
+    dcc.Location(id="url", refresh=False),
+    html.Div(id="dev-cookie-status-wrapper"),
+]
+LAYOUT_TAIL = [
+    dcc.Store(id="loading-flag", data=False),
+    dcc.Store(id="chart-request", data="local"),
+    dcc.Store(id="is-admin", data=False),
+    dcc.Store(id="event-key"),
+    html.Div(id="auth-buttons", className="auth-buttons"),
+    html.Div(id="delete-status"),
+    html.Div(id="form-error"),
+    html.Div(id="page-container", className="page-container"),
+]
 
 
 def render_layout_with_cookie():
     submitted_cookie = request.cookies.get("submitted", "false")
     return html.Div(
-        [
-            dcc.Location(id="url", refresh=False),
-            html.Div(id="dev-cookie-status-wrapper"),
+        LAYOUT_HEAD
+        + [
             dcc.Store(id="submission-store", data=submitted_cookie),
-            dcc.Store(id="loading-flag", data=False),
-            dcc.Store(id="chart-request", data="local"),
-            dcc.Store(id="is-admin", data=False),
-            html.Div(id="auth-buttons", className="auth-buttons"),
-            html.Div(id="delete-status"),
-            html.Div(id="form-error"),
-            html.Div(id="page-container", className="page-container"),
-        ],
+            dcc.Store(id="logged-in", data="profile" in session),
+        ]
+        + LAYOUT_TAIL,
         className="main-layout",
     )
 
 
-# Callback for the admin URL - Adds login button if so.
-@app.callback(Output("auth-buttons", "children"), Input("url", "search"))
-def show_auth_buttons(search):
-    query = parse_qs(search.lstrip("?"))
-    is_admin_query = query.get("admin", ["false"])[0].lower() == "true"
+# Callback for the admin URL - Adds login button if so. This and the other
+# purely presentational callbacks run in the browser (assets/clientside.js).
+app.clientside_callback(
+    ClientsideFunction(namespace="ui", function_name="authButtons"),
+    Output("auth-buttons", "children"),
+    Input("url", "search"),
+    State("logged-in", "data"),
+)
 
-    if not is_admin_query:
-        return ""
 
-    if "profile" in session:
-        return html.A("Logout", href="/logout", style={"marginRight": "10px"})
-    else:
-        return html.A("Login", href="/login?next=/?admin=true")
+# Check if user is admin
+app.clientside_callback(
+    ClientsideFunction(namespace="ui", function_name="isAdminQuery"),
+    Output("is-admin", "data"),
+    Input("url", "search"),
+)
 
 
-# Check if user is admin
-@app.callback(Output("is-admin", "data"), Input("url", "search"))
-def extract_admin_flag(search):
-    query = parse_qs(search.lstrip("?"))
-    return query.get("admin", ["false"])[0].lower() == "true"
+# The event picked with ?event=<key>, if any. Callbacks resolve it with
+# events.resolve(), which falls back to the current event.
+app.clientside_callback(
+    ClientsideFunction(namespace="ui", function_name="eventQuery"),
+    Output("event-key", "data"),
+    Input("url", "search"),
+)
 
 
-# Country Integration:
-def get_country_list():
-    try:
-        response = requests.get("https://restcountries.com/v3.1/all")
-        countries = sorted([c["name"]["common"] for c in response.json()])
+# Country Integration: the list is bundled and loaded once at startup.
+COUNTRY_REFRESH_INTERVAL = os.getenv("COUNTRY_REFRESH_INTERVAL")
+if COUNTRY_REFRESH_INTERVAL:
+    start_background_refresh(int(COUNTRY_REFRESH_INTERVAL))
 
-        if "United States" in countries:
-            countries.remove("United States")
-        countries.insert(0, "United States")
-        return countries
-    except Exception as e:
-        print("Failed to fetch countries:", str(e))
-        return [
-            "United States",
-            "Canada",
-            "United Kingdom",
-            "Other",
-        ]  # Fallback
+_threads_lock = threading.Lock()
+_threads_pid = os.getpid()
 
 
-import requests
+# A process forked from this one starts its own log listener and country
+# refresh on its first request. Background chart jobs serve none, so they
+# never start them.
+@server.before_request
+def start_process_threads():
+    global _threads_pid, log_listener
+    if _threads_pid == os.getpid():
+        return
+    with _threads_lock:
+        if _threads_pid == os.getpid():
+            return
+        if LOG_LEVEL != "OFF":
+            logging.getLogger().removeHandler(log_output)
+            logging.getLogger().addHandler(log_handler)
+            log_listener = QueueListener(log_queue, log_output)
+            log_listener.start()
+        if COUNTRY_REFRESH_INTERVAL:
+            start_background_refresh(int(COUNTRY_REFRESH_INTERVAL))
+        _threads_pid = os.getpid()
 
 
 # Callback for state dropdown
@@ -197,55 +336,45 @@ def show_state_dropdown(selected_country):
     if not selected_country:
         raise PreventUpdate
 
-    try:
-        res = requests.post(
-            "https://countriesnow.space/api/v0.1/countries/states",
-            json={"country": selected_country},
-        )
-        data = res.json()
-        print("CountriesNow API Response:", data)
-
-        if not data or data.get("error", True) or "data" not in data:
-            print("❌ Invalid or error response")
-            return html.Div("Could not load states", style={"color": "red"})
-
-        states = data["data"].get("states", [])
-        if selected_country == "United States":
-            states.append(
-                {"name": "District of Columbia"}
-            )  # 👈 Add DC manually
-
-        if not states:
-            return ""
-
-        return html.Div(
-            [
-                html.Label("State/Province:", style={"fontWeight": "bold"}),
-                dcc.Dropdown(
-                    id="state-dropdown",
-                    options=[
-                        {"label": s["name"], "value": s["name"]}
-                        for s in states
-                    ],
-                    placeholder="Select a state...",
-                ),
-            ],
-            style={"marginTop": "1rem"},
-        )
+    options = get_state_options(selected_country)
+    if not options:
+        return ""
 
-    except Exception as e:
-        print("❌ API request failed:", str(e))
-        return html.Div("Could not load states", style={"color": "red"})
+    return html.Div(
+        [
+            html.Label("State/Province:", style={"fontWeight": "bold"}),
+            dcc.Dropdown(
+                id="state-dropdown",
+                options=options,
+                placeholder="Select a state...",
+            ),
+        ],
+        style={"marginTop": "1rem"},
+    )
 
 
 @app.callback(
     Output("page-container", "children"), Input("submission-store", "data")
 )
 def render_layout(submitted):
-    print("Submission store data:", submitted)  # Add this line to debug
+    logger.debug("Submission store data: %s", submitted)
     if submitted == "true":
-        return post_submit()
-    return pre_submit()
+        return cached_tree("post_submit", post_submit)
+    return cached_tree("pre_submit", pre_submit, get_country_list())
+
+
+# The form and dashboard trees are the same for every visitor, so each is
+# built and serialized once. `key` rebuilds the tree when it changes (the
+# country list can be refreshed in the background).
+_tree_cache = {}
+
+
+def cached_tree(name, build, key=None):
+    entry = _tree_cache.get(name)
+    if entry is None or entry[0] is not key:
+        entry = (key, json.loads(to_json_plotly(build())))
+        _tree_cache[name] = entry
+    return entry[1]
 
 
 # This is the form before a user submits it
@@ -260,6 +389,7 @@ def pre_submit():
                     dcc.Input(
                         id="inpu",
                         type="text",
+                        maxLength=MAX_LENGTHS["Name"],
                         placeholder="Type here...",
                         value="",
                         className="form-input",
@@ -374,11 +504,16 @@ def pre_submit():
     )
 
 
+def download_url(event_key):
+    return f"{DOWNLOAD_URL}?event={events.resolve(engine, event_key)}"
+
+
 @app.callback(
     Output("admin-panel-wrapper-container", "children"),
     Input("submission-store", "data"),
+    State("event-key", "data"),
 )
-def show_admin_if_allowed(_):
+def show_admin_if_allowed(_, event_key):
     if is_admin_user():
         return html.Div(
             [
@@ -387,13 +522,15 @@ def show_admin_if_allowed(_):
                     children=[
                         html.Hr(),
                         html.H4("Admin Tools"),
-                        dcc.Download(id="download"),
                         html.Div(
                             [
-                                html.Button(
-                                    "Download CSV",
-                                    id="download-btn",
-                                    className="custom-button",
+                                html.A(
+                                    html.Button(
+                                        "Download CSV",
+                                        id="download-btn",
+                                        className="custom-button",
+                                    ),
+                                    href=download_url(event_key),
                                 ),
                                 html.Button(
                                     "View Data",
@@ -407,7 +544,7 @@ def show_admin_if_allowed(_):
                                     className="custom-button",
                                 ),
                                 html.Button(
-                                    "Delete responses.csv",
+                                    "Start New Event",
                                     id="delete-button",
                                     n_clicks=0,
                                     style={"color": "red"},
@@ -480,6 +617,12 @@ def post_submit():
                                 n_clicks=0,
                                 className="custom-button",
                             ),
+                            html.Button(
+                                "Over Time",
+                                id={"type": "chart-btn", "value": "over_time"},
+                                n_clicks=0,
+                                className="custom-button",
+                            ),
                         ],
                     ),
                 ],
@@ -489,102 +632,147 @@ def post_submit():
                 dcc.Loading(
                     id="loading-chart",
                     type="circle",
+                    # Live refreshes come from the figure cache; don't flash
+                    # the spinner for them.
+                    delay_show=300,
                     children=html.Div(id="chart-output",style={'marginTop':'40px'}),
                 )
             ),
             html.Div(id="admin-panel-wrapper-container"),
+            dcc.Interval(
+                id="live-interval",
+                interval=max(LIVE_POLL_SECONDS, 1) * 1000,
+                disabled=not LIVE_POLL_SECONDS,
+            ),
+            dcc.Store(id="live-count"),
+            dcc.Store(id="live-refresh"),
         ]
     )
 
 
+# Live dashboards: on each tick the browser asks LIVE_URL how many responses
+# the event has and, only when there are more than when it last asked,
+# sets live-refresh so update_chart_view redraws the chart on screen.
+app.clientside_callback(
+    ClientsideFunction(namespace="ui", function_name="pollResponses"),
+    Output("live-count", "data"),
+    Output("live-refresh", "data"),
+    Input("live-interval", "n_intervals"),
+    State("event-key", "data"),
+    State("live-count", "data"),
+    prevent_initial_call=True,
+)
+
+
 # Hamburger Menu Callback:
-@app.callback(
-    Output("nav-menu", "style", allow_duplicate = True),
+app.clientside_callback(
+    ClientsideFunction(namespace="ui", function_name="toggleNav"),
+    Output("nav-menu", "style", allow_duplicate=True),
     Input("hamburger", "n_clicks"),
     State("nav-menu", "style"),
     prevent_initial_call=True,
 )
-def toggle_nav(n_clicks, current_style):
-    if n_clicks is None:
-        return no_update
-
-    # If there is no current style, set it to an initial state
-    if current_style is None:
-        return {"display": "flex"}
-
-    # Toggle display based on the current style of the menu
-    new_style = current_style.copy() if current_style else {}
-    if new_style.get("display") == "none":
-        new_style["display"] = "flex"  # Show the menu
-    else:
-        new_style["display"] = "none"  # Hide the menu
-    return new_style
 
-@app.callback(
-    Output("nav-menu", "style", allow_duplicate = True),
-    Output("chart-request", "data"),  # Update the chart request
+# Chart buttons: hide the menu and request the clicked chart.
+app.clientside_callback(
+    ClientsideFunction(namespace="ui", function_name="selectChart"),
+    Output("nav-menu", "style", allow_duplicate=True),
+    Output("chart-request", "data"),
     Input({"type": "chart-btn", "value": ALL}, "n_clicks"),
     prevent_initial_call=True,
 )
-def toggle_nav_and_select_chart(n_clicks_list):
-    triggered = ctx.triggered_id
-
-    if not triggered:
-        raise PreventUpdate
-
-    # Hide the nav menu after chart selection
-    new_style = {"display": "none"}
-
-    # Get the chart type from the button that was clicked
-    chart_type = triggered["value"]
-
-    return new_style, chart_type
-
-
-
-
-
-
-delete_triggered = False  # Delete safeguard
 
 
+# Starts a new event, so the dashboard starts again from zero. Earlier
+# responses are kept under their event and can still be viewed with
+# ?event=<key>.
 @app.callback(
     Output("delete-status", "children"),
     Input("delete-button", "n_clicks"),
     prevent_initial_call=True,
 )
-def delete_sql_responses(n_clicks):
+def start_new_event(n_clicks):
     if ctx.triggered_id == "delete-button" and n_clicks:
+        if events.EVENT_KEY:
+            return (
+                f"❌ The event is set by EVENT_KEY ({events.EVENT_KEY}); "
+                "change it there."
+            )
         try:
-            with engine.connect() as conn:
-                conn.execute(text("DELETE FROM responses"))
-            request._clear_cookie = True
-            return "✅ All responses deleted from the database."
-        except Exception as e:
-            print("Delete failed:", e)
-            return "❌ Failed to delete responses from the database."
+            previous = events.current_event(engine)
+            key = events.start_event(engine)
+            g.clear_submitted_cookie = True
+            return f"✅ Started event {key}. Responses from {previous} are kept."
+        except Exception:
+            logger.exception("Starting a new event failed")
+            return "❌ Failed to start a new event."
     raise PreventUpdate
 
 
-import time
-
-
 @app.callback(
     Output("chart-output", "children"),
-    Output("loading-flag", "data", allow_duplicate=True),
     Input("chart-request", "data"),
+    Input("live-refresh", "data"),
+    State("event-key", "data"),
+    State(CHART_GRAPHS, "id"),
+    running=[(Output("loading-flag", "data"), True, False)],
+    background=BACKGROUND_CHARTS,
     prevent_initial_call=True,
 )
-def update_chart_view(chart_type):
-    # Optional delay to simulate loading — can be removed
-    time.sleep(0.5)
+def update_chart_view(chart_type, live_refresh, event_key, graph_ids):
+    live = ctx.triggered_id == "live-refresh"
+    # The data table would lose its page and filters; it isn't refreshed.
+    if live and chart_type == "data":
+        raise PreventUpdate
+    layout = get_chart_layout(chart_type, events.resolve(engine, event_key))
+    if live:
+        return patch_figures(layout, graph_ids)
+    return layout
+
+
+# (path, graph) for each chart graph in a layout, the path being where the
+# graph sits in the layout's JSON.
+def find_chart_graphs(layout, path=()):
+    if isinstance(layout, (list, tuple)):
+        for i, child in enumerate(layout):
+            yield from find_chart_graphs(child, path + (i,))
+    elif isinstance(layout, Component):
+        graph_id = getattr(layout, "id", None)
+        if isinstance(graph_id, dict) and graph_id.get("type") == "chart-graph":
+            yield path, layout
+        else:
+            yield from find_chart_graphs(
+                getattr(layout, "children", None), path + ("props", "children")
+            )
+
 
-    return get_chart_layout(chart_type), False
+# A live refresh sends only the new figure data into the graphs already on
+# the page, so the rest of the chart (an open state drill-down) stays as
+# it is. The layout goes whole if it has no graphs, or not the ones on the
+# page, e.g. the chart's first responses replacing "No data available."
+def patch_figures(layout, graph_ids):
+    graphs = list(find_chart_graphs(layout))
 
+    def key(graph_id):
+        return json.dumps(graph_id, sort_keys=True)
 
-# Check if Local
-def checkLocal(state_):
-    return state_ == "District of Columbia"
+    if not graphs or (
+        sorted(key(graph.id) for _, graph in graphs) != sorted(map(key, graph_ids))
+    ):
+        return layout
+
+    patch = Patch()
+    for path, graph in graphs:
+        target = patch
+        for step in path:
+            target = target[step]
+        figure = target["props"]["figure"]
+        figure["data"] = graph.figure["data"]
+        # The template is the bulk of the layout and never changes.
+        for name, value in graph.figure["layout"].items():
+            if name != "template":
+                figure["layout"][name] = value
+    return patch
 
 
 # This is our main callback for when the form is submitted
@@ -603,13 +791,22 @@ def checkLocal(state_):
     State("how-they-found-us", "value"),
     State("country-dropdown", "value"),
     State("state-dropdown", "value"),
+    State("event-key", "data"),
     prevent_initial_call=True,
 )
 def form_submission(
-    n_clicks, inpu, age_val, christian, faith, howtheyfoundus, country_, state_
+    n_clicks,
+    inpu,
+    age_val,
+    christian,
+    faith,
+    howtheyfoundus,
+    country_,
+    state_,
+    event_key,
 ):
-    print(
-        "Form callback triggered!",
+    logger.debug(
+        "Form callback triggered! %s %s %s %s %s %s",
         n_clicks,
         inpu,
         age_val,
@@ -617,23 +814,20 @@ def form_submission(
         faith,
         howtheyfoundus,
     )
-    local_value = checkLocal(state_)
-
     if n_clicks > 0:
-        request._set_cookie = True
-        age_category = bin_age(age_val)
-        required_fields = {
-            "Name": inpu,
-            "Age Range": age_val,
-            "Christ Follower": christian,
-            "Faith Decicion": faith,
-        }
+        new_row = build_row(
+            inpu,
+            age_val,
+            christian,
+            faith,
+            howtheyfoundus,
+            country_,
+            state_,
+            time_buckets.utc_now(),
+            events.resolve(engine, event_key),
+        )
 
-        missing = [
-            field
-            for field, value in required_fields.items()
-            if not str(value).strip()
-        ]
+        missing = missing_fields(new_row)
         if missing:
             return (
                 no_update,
@@ -641,87 +835,27 @@ def form_submission(
                 f"⚠️ Please fill out: {', '.join(missing)}.",
                 False,
             )
-
-        new_row = pd.DataFrame(
-            [
-                [
-                    inpu,
-                    age_category,
-                    age_val,
-                    local_value,
-                    country_,
-                    state_,
-                    christian,
-                    faith,
-                    howtheyfoundus,
-                ]
-            ],
-            columns=columns,
-        )
-
-        global df
+        # Checked here too, so the queue is never given a row the database
+        # will refuse after the visitor was told it was saved.
+        invalid = invalid_values(new_row)
+        if invalid:
+            return no_update, no_update, f"⚠️ {'; '.join(invalid)}.", False
+
+        # Queued to local disk and written to the database in batches by
+        # write_queue; the chart counts are updated once the batch commits.
         try:
-            with engine.connect() as conn:
-                query = text("""
-                INSERT INTO responses (
-                    "Name", "Age Range", "Age", "Local", "Country", "State",
-                    "Christ Follower", "Faith Decicion", "How you found us?"
-                )
-                VALUES (
-                    :name, :age_range, :age, :local, :country, :state,
-                    :christ_follower, :faith_decicion, :how_found
-                )
-            """)
-
-                conn.execute(query, {
-                    "name": inpu,
-                    "age_range": age_category,
-                    "age": age_val,
-                    "local": local_value,
-                    "country": country_,
-                    "state": state_,
-                    "christ_follower": christian,
-                    "faith_decicion": faith,
-                    "how_found": howtheyfoundus,
-                })
-        except Exception as e:
-            print("Database insert error:", e)
+            queue_submission(new_row)
+        except Exception:
+            logger.exception("Submission spool error")
             return no_update, False, "Error saving your submission.", False
 
-
+        g.set_submitted_cookie = True
         # Set loading to true after successful submission
         return "local", "true", "", True
 
     return no_update, False, "", False
 
 
-# Simple function to take any given age and bin it so we can created age groups.
-
-
-def bin_age(age):
-    if age < 18:
-        return "<18"
-    elif 18 <= age <= 25:
-        return "18-25"
-    elif 26 <= age <= 40:
-        return "25-40"
-    else:
-        return ">40"
-
-
-@app.callback(
-    Output("chart-request", "data", allow_duplicate=True),
-    Output("loading-flag", "data", allow_duplicate=True),
-    Input({"type": "chart-btn", "value": ALL}, "n_clicks"),
-    prevent_initial_call=True,
-)
-def nav_chart_select(n_clicks_list):
-    triggered = ctx.triggered_id
-    if not triggered:
-        raise PreventUpdate
-    return triggered["value"], True
-
-
 @app.callback(
     Output("chart-request", "data", allow_duplicate=True),
     Output("loading-flag", "data", allow_duplicate=True),
@@ -737,83 +871,135 @@ def handle_data_click(n_clicks):
 # Choose which chart we send to Output
 
 
-def get_chart_layout(chart_type):
+def get_chart_layout(chart_type, event):
+    if chart_type == "data":
+        # Rows are fetched a page at a time by update_responses_table.
+        return dash_table.DataTable(
+            id="responses-table",
+            columns=[{"name": c, "id": c} for c in columns],
+            style_table={"overflowX": "auto"},
+            style_cell={"textAlign": "left", "padding": "5px"},
+            style_header={"fontWeight": "bold"},
+            page_current=0,
+            page_size=20,
+            page_action="custom",
+            sort_action="custom",
+            sort_mode="multi",
+            sort_by=[],
+            filter_action="custom",
+            filter_query="",
+        )
+
+    if chart_type not in CHART_TYPES:
+        return html.Div("Unknown chart type.")
+
+    # Charts are cached per event and data version and built from the
+    # cached counts; the database is only queried when they are due for a
+    # refresh. A chart can be built from counts a submission newer than the
+    # version it is stored under, never older.
+    try:
+        version = chart_version(chart_type, event)
+        return figure_cache.get_or_build(
+            (chart_type, event, version),
+            lambda: build_chart(chart_type, event, get_counters(engine, event)[1]),
+        )
+    except Exception:
+        logger.exception("Chart query failed")
+        return html.Div("Failed to load chart.")
+
+
+# The over-time chart also shows the other events of the same name, so it
+# is rebuilt when any of them changes.
+def chart_version(chart_type, event):
+    if chart_type == "over_time":
+        return tuple(
+            counters_version(engine, key) for key in events.same_name(engine, event)
+        )
+    return counters_version(engine, event)
+
+
+def build_chart(chart_type, event, snapshot):
     if chart_type == "local":
-        return local_counter()
+        return local_counter_sql(snapshot)
     if chart_type == "state_map":
-        return generate_us_map()
+        return generate_us_map(snapshot)
     elif chart_type == "age":
         return html.Div(
             [
                 generate_pie_chart_from_column(
-                    "Age Range", "Age Distribution"
+                    snapshot, "Age Range", "Age Distribution", ("age", 0)
+                ),
+                generate_bar_chart_from_column(
+                    snapshot, "Age", "Ages in attendance", ("age", 1)
                 ),
-                generate_bar_chart_from_column("Age", "Ages in attendance"),
             ]
         )
     elif chart_type == "christians":
         return generate_pie_chart_from_column(
-            "Christ Follower", "Christ Follower Count"
+            snapshot, "Christ Follower", "Christ Follower Count", ("christians",)
         )
     elif chart_type == "faithdecicion":
         return generate_pie_chart_from_column(
-            "Faith Decicion", "Faith Decision Count"
+            snapshot, "Faith Decicion", "Faith Decision Count", ("faithdecicion",)
         )
-    elif chart_type == "data":
-        try:
-            with engine.connect() as conn:
-                df_sql = pd.read_sql("SELECT * FROM responses", conn)
-
-            return dash_table.DataTable(
-                data=df_sql.to_dict("records"),
-                columns=[{"name": str(i), "id": str(i)} for i in df_sql.columns],
-                style_table={"overflowX": "auto"},
-                style_cell={"textAlign": "left", "padding": "5px"},
-                style_header={"fontWeight": "bold"},
-                page_size=20,
-            )
-        except Exception as e:
-            print("View Data SQL query failed:", e)
-            return html.Div("❌ Could not load data from the database.")
-    else:
-        return html.Div("Unknown chart type.")
+    elif chart_type == "over_time":
+        return generate_time_chart(event)
+
+
+CHART_TYPES = [
+    "local",
+    "state_map",
+    "age",
+    "christians",
+    "faithdecicion",
+    "over_time",
+]
+
+
+@app.callback(
+    Output("responses-table", "data"),
+    Output("responses-table", "page_count"),
+    Input("responses-table", "page_current"),
+    Input("responses-table", "page_size"),
+    Input("responses-table", "sort_by"),
+    Input("responses-table", "filter_query"),
+    State("event-key", "data"),
+)
+def update_responses_table(
+    page_current, page_size, sort_by, filter_query, event_key
+):
+    try:
+        return fetch_page(
+            engine,
+            columns,
+            page_current,
+            page_size,
+            sort_by,
+            filter_query,
+            events.resolve(engine, event_key),
+        )
+    except Exception:
+        logger.exception("View Data SQL query failed")
+        return [], 1
 
 
-def generate_us_map():
+def generate_us_map(snapshot):
+    import pandas as pd
+    import plotly.express as px
+
     try:
-        with engine.connect() as conn:
-            result = conn.execute(text("""
-                SELECT state, COUNT(*) 
-                FROM responses 
-                WHERE state IS NOT NULL AND state != ''
-                GROUP BY state
-            """)).fetchall()
+        # States are stored as USPS codes at write time (geo.state_code).
+        result = [
+            (code, count)
+            for code, count in snapshot["State Code"].items()
+            if code
+        ]
 
         if not result:
             return html.Div("No state data available.", style={"color": "gray", "textAlign": "center"})
 
-        state_abbrev = {
-            "Alabama": "AL", "Alaska": "AK", "Arizona": "AZ", "Arkansas": "AR",
-            "California": "CA", "Colorado": "CO", "Connecticut": "CT", "Delaware": "DE",
-            "District Of Columbia": "DC", "Florida": "FL", "Georgia": "GA", "Hawaii": "HI",
-            "Idaho": "ID", "Illinois": "IL", "Indiana": "IN", "Iowa": "IA", "Kansas": "KS",
-            "Kentucky": "KY", "Louisiana": "LA", "Maine": "ME", "Maryland": "MD",
-            "Massachusetts": "MA", "Michigan": "MI", "Minnesota": "MN", "Mississippi": "MS",
-            "Missouri": "MO", "Montana": "MT", "Nebraska": "NE", "Nevada": "NV",
-            "New Hampshire": "NH", "New Jersey": "NJ", "New Mexico": "NM", "New York": "NY",
-            "North Carolina": "NC", "North Dakota": "ND", "Ohio": "OH", "Oklahoma": "OK",
-            "Oregon": "OR", "Pennsylvania": "PA", "Rhode Island": "RI",
-            "South Carolina": "SC", "South Dakota": "SD", "Tennessee": "TN", "Texas": "TX",
-            "Utah": "UT", "Vermont": "VT", "Virginia": "VA", "Washington": "WA",
-            "West Virginia": "WV", "Wisconsin": "WI", "Wyoming": "WY"
-        }
-
-        state_names, counts = zip(*result)
-        df_chart = pd.DataFrame({
-            "State": [s.strip().title() for s in state_names],
-            "Count": counts
-        })
-        df_chart["Code"] = df_chart["State"].map(state_abbrev)
+        codes, counts = zip(*result)
+        df_chart = pd.DataFrame({"Code": codes, "Count": counts})
 
         fig = px.choropleth(
             df_chart,
@@ -831,21 +1017,77 @@ def generate_us_map():
             plot_bgcolor="#FEFAE0",
         )
 
-        return html.Div(dcc.Graph(figure=fig), className="graph-object")
+        # Clicking a state shows its breakdowns below (drill_down_state).
+        return html.Div(
+            [
+                html.Div(
+                    chart_graph(fig, "state_map"),
+                    className="graph-object",
+                ),
+                html.Div(id="drill-down"),
+            ]
+        )
 
-    except Exception as e:
-        print("Map chart query failed:", e)
+    except Exception:
+        logger.exception("Map chart failed")
         return html.Div("Failed to load state map.")
 
 
-def local_counter_sql():
+# Ages and faith decisions for the state clicked on the map, from the
+# in-memory cube (cube.py), so a click runs no SQL.
+@app.callback(
+    Output("drill-down", "children"),
+    Input(STATE_MAP, "clickData"),
+    State("event-key", "data"),
+    prevent_initial_call=True,
+)
+def drill_down_state(click_data, event_key):
+    points = (click_data or {}).get("points") or []
+    code = points[0].get("location") if points else None
+    if not code:
+        raise PreventUpdate
+
+    event = events.resolve(engine, event_key)
     try:
-        with engine.connect() as conn:
-            result = conn.execute(text("""
-                SELECT local, COUNT(*) 
-                FROM responses 
-                GROUP BY local
-            """)).fetchall()
+        version, snapshot = cube.filtered_counts(
+            engine, event, {"State Code": code}
+        )
+        return figure_cache.get_or_build(
+            ("drill_down", code, event, version),
+            lambda: build_drill_down(code, snapshot),
+        )
+    except Exception:
+        logger.exception("Drill-down failed")
+        return html.Div("Failed to load breakdown.")
+
+
+def build_drill_down(code, snapshot):
+    name = US_STATE_NAMES.get(code, code)
+    total = sum(snapshot["State Code"].values())
+    if not total:
+        return html.Div(f"No responses from {name}.")
+    return html.Div(
+        [
+            html.H4(f"{name}: {total} responses", style={"textAlign": "center"}),
+            generate_pie_chart_from_column(
+                snapshot, "Age Range", f"Age Distribution in {name}", None
+            ),
+            generate_bar_chart_from_column(
+                snapshot, "Age", f"Ages in attendance from {name}", None
+            ),
+            generate_pie_chart_from_column(
+                snapshot, "Faith Decicion", f"Faith Decisions in {name}", None
+            ),
+        ]
+    )
+
+
+def local_counter_sql(snapshot):
+    import pandas as pd
+    import plotly.express as px
+
+    try:
+        result = list(snapshot["Local"].items())
 
         if not result:
             return html.Div("No data available.")
@@ -865,21 +1107,20 @@ def local_counter_sql():
             hole=0.1,
         )
 
-        return html.Div(dcc.Graph(figure=style_pie_chart(fig, "Local vs Visitor")), className="graph-object")
+        return html.Div(chart_graph(style_pie_chart(fig, "Local vs Visitor"), "local"), className="graph-object")
 
-    except Exception as e:
-        print("Local chart query failed:", e)
+    except Exception:
+        logger.exception("Local chart failed")
         return html.Div("Failed to load chart.")
 
 
-def generate_pie_chart_from_column(column_name, title):
+# graph is (chart type, index) for chart_graph(), or None for a plain graph.
+def generate_pie_chart_from_column(snapshot, column_name, title, graph):
+    import pandas as pd
+    import plotly.express as px
+
     try:
-        with engine.connect() as conn:
-            result = conn.execute(text(f"""
-                SELECT "{column_name}", COUNT(*) 
-                FROM responses 
-                GROUP BY "{column_name}"
-            """)).fetchall()
+        result = list(snapshot[column_name].items())
 
         if not result:
             return html.Div("No data available.")
@@ -894,22 +1135,23 @@ def generate_pie_chart_from_column(column_name, title):
             hole=0.1,
         )
 
-        return html.Div(dcc.Graph(figure=style_pie_chart(fig, title)), className="graph-object")
+        fig = style_pie_chart(fig, title)
+        return html.Div(plain_or_chart_graph(fig, graph), className="graph-object")
 
-    except Exception as e:
-        print("Chart query failed:", e)
+    except Exception:
+        logger.exception("Chart failed")
         return html.Div("Failed to load chart.")
 
 
-def generate_bar_chart_from_column(column_name, title):
+def generate_bar_chart_from_column(snapshot, column_name, title, graph):
+    import pandas as pd
+    import plotly.express as px
+
     try:
-        with engine.connect() as conn:
-            result = conn.execute(text(f"""
-                SELECT "{column_name}", COUNT(*) 
-                FROM responses 
-                GROUP BY "{column_name}"
-                ORDER BY "{column_name}"
-            """)).fetchall()
+        result = sorted(
+            snapshot[column_name].items(),
+            key=lambda item: (item[0] is None, item[0]),
+        )
 
         if not result:
             return html.Div("No data available.")
@@ -936,23 +1178,71 @@ def generate_bar_chart_from_column(column_name, title):
             plot_bgcolor="#FEFAE0",
         )
 
-        return html.Div(dcc.Graph(figure=fig), className="graph-output")
+        return html.Div(plain_or_chart_graph(fig, graph), className="graph-output")
     
-    except Exception as e:
-        print("Bar chart query failed:", e)
+    except Exception:
+        logger.exception("Bar chart failed")
+        return html.Div("Failed to load chart.")
+
+
+# Arrivals per minute, hour or day from the pre-aggregated buckets of the
+# event and the other events of the same name (each year's "Easter"), with the
+# granularity picked from how long a span the data covers. Day counts
+# spanning several years get one line per year on a shared calendar, so
+# years can be compared.
+def generate_time_chart(event):
+    import pandas as pd
+    import plotly.express as px
+
+    try:
+        granularity, series = time_buckets.load_series(
+            engine, events.same_name(engine, event)
+        )
+
+        if not series:
+            return html.Div("No data available.")
+
+        starts, counts = zip(*series)
+        df_chart = pd.DataFrame({"Time": starts, "Count": counts})
+        title = f"Arrivals per {granularity}"
+
+        years = sorted({start.year for start in starts})
+        if granularity == "day" and len(years) > 1:
+            # 2000 is a leap year, so Feb 29 has somewhere to go.
+            df_chart["Year"] = [str(start.year) for start in starts]
+            df_chart["Time"] = [start.replace(year=2000) for start in starts]
+            fig = px.line(df_chart, x="Time", y="Count", color="Year", markers=True)
+            fig.update_xaxes(tickformat="%b %d")
+        else:
+            fig = px.bar(df_chart, x="Time", y="Count")
+
+        fig.update_layout(
+            title_text=title,
+            title_x=0.5,
+            xaxis_title=None,
+            yaxis_title="Responses",
+            margin=dict(t=50, b=80, l=30, r=30),
+            height=400,
+            paper_bgcolor="#FEFAE0",
+            plot_bgcolor="#FEFAE0",
+        )
+
+        return html.Div(chart_graph(fig, "over_time"), className="graph-output")
+
+    except Exception:
+        logger.exception("Time chart failed")
         return html.Div("Failed to load chart.")
 
 
 from dash import MATCH
 
 
-@app.callback(
+app.clientside_callback(
+    ClientsideFunction(namespace="ui", function_name="showCodeInput"),
     Output("admin-code", "style"),
     Input("admin-toggle", "n_clicks"),
     prevent_initial_call=True,
 )
-def show_code_input(n):
-    return {"display": "inline-block", "marginTop": "10px"}
 
 
 ADMIN_CODE = "letmein123"  # You can make this env-based for real security
@@ -961,20 +1251,24 @@ ADMIN_CODE = "letmein123"  # You can make this env-based for real security
 @app.callback(
     Output("admin-panel", "children"),
     Input("admin-code", "value"),
+    State("event-key", "data"),
     prevent_initial_call=True,
 )
-def grant_admin_access(code):
+def grant_admin_access(code, event_key):
     if code == ADMIN_CODE:
         return html.Div(
             [
                 html.Hr(),
                 html.H4("Admin Tools"),
-                html.Button(
-                    "Download CSV",
-                    id="download-btn",
-                    type="button",
-                    className="custom-button-dev",
-                    classNameProp=True,
+                html.A(
+                    html.Button(
+                        "Download CSV",
+                        id="download-btn",
+                        type="button",
+                        className="custom-button-dev",
+                        classNameProp=True,
+                    ),
+                    href=download_url(event_key),
                 ),
                 html.Button(
                     "View Data",
@@ -989,11 +1283,10 @@ def grant_admin_access(code):
                     n_clicks=0,
                     className="custom-button-dev",
                 ),
-                dcc.Download(id="download"),
                 html.Div(
                     [
                         html.Button(
-                            "Delete responses.csv",
+                            "Start New Event",
                             id="delete-button",
                             n_clicks=0,
                             style={"color": "red"},
@@ -1027,8 +1320,8 @@ def dev_clear_cookie(n_clicks):
     if ctx.triggered_id != "dev-clear-cookies" or not n_clicks:
         raise PreventUpdate
 
-    print(">> Clearing cookie (from button)")
-    request._clear_cookie = True
+    logger.debug("Clearing cookie (from button)")
+    g.clear_submitted_cookie = True
     return html.Div(
         [
             html.Div("✅ Cookie cleared!", id="dev-cookie-status"),
@@ -1037,25 +1330,12 @@ def dev_clear_cookie(n_clicks):
     )
 
 
-@app.callback(
-    Output("download", "data"),
-    Input("download-btn", "n_clicks"),
-    prevent_initial_call=True,
-)
-def download_data(n_clicks):
-    try:
-        with engine.connect() as conn:
-            df_sql = pd.read_sql("SELECT * FROM responses", conn)
-        return dcc.send_data_frame(df_sql.to_csv, "responses.csv", index=False)
-    except Exception as e:
-        print("CSV download failed:", e)
-        raise PreventUpdate
-
-
+# Callbacks ask for the submitted cookie to be set or cleared through
+# flask.g, which lasts for the one request.
 @app.server.after_request
 def apply_cookie_flags(response):
-    if getattr(request, "_set_cookie", False):
-        print(">> Setting cookie")
+    if g.get("set_submitted_cookie"):
+        logger.debug("Setting cookie")
         response.set_cookie(
             "submitted",
             "true",
@@ -1064,12 +1344,34 @@ def apply_cookie_flags(response):
             samesite="Lax",
             secure=False,  # Adjust secure=True if using HTTPS
         )
-    if getattr(request, "_clear_cookie", False):
-        print(">> Clearing cookie")
+    if g.get("clear_submitted_cookie"):
+        logger.debug("Clearing cookie")
         response.set_cookie("submitted", "", max_age=0, path="/")
     return response
 
 
+# Serialized once when a chart is built, so cached charts don't pay for
+# converting the Figure on every response.
+def figure_json(fig):
+    return json.loads(fig.to_json())
+
+
+# A graph of the dashboard's charts, which a live refresh updates in place
+# (patch_figures). Charts with several graphs number them from 0.
+def chart_graph_id(chart_type, index=0):
+    return {"type": "chart-graph", "chart": chart_type, "index": index}
+
+
+def chart_graph(fig, chart_type, index=0):
+    return dcc.Graph(id=chart_graph_id(chart_type, index), figure=figure_json(fig))
+
+
+def plain_or_chart_graph(fig, graph):
+    if graph is None:
+        return dcc.Graph(figure=figure_json(fig))
+    return chart_graph(fig, *graph)
+
+
 def style_pie_chart(fig, title):
     fig.update_traces(
         textposition="inside",
@@ -1098,16 +1400,17 @@ def login():
         "next", "/?admin=true"
     )  # default to /?admin=true
     session["next_url"] = next_url
-    return auth0.authorize_redirect(redirect_uri=redirect_uri)
+    return get_auth0().authorize_redirect(redirect_uri=redirect_uri)
 
 
 @server.route("/callback")
 def callback():
     try:
+        auth0 = get_auth0()
         auth0.authorize_access_token()
         resp = auth0.get("userinfo")
         userinfo = resp.json()
-        print("Auth0 Userinfo:", userinfo)  # <- Inspect this
+        logger.debug("Auth0 Userinfo: %s", userinfo)
 
         session["profile"] = {
             "user_id": userinfo.get("sub"),
@@ -1120,13 +1423,83 @@ def callback():
         next_url = session.pop("next_url", "/")
         return redirect(next_url)
     except Exception as e:
-        import traceback
-
-        print("Callback error:", str(e))
-        traceback.print_exc()
+        logger.exception("Callback error")
         return f"Callback failed: {e}", 500
 
 
+# Streams one event's responses (?event=<key>, or the current event) as
+# CSV straight from a server-side cursor, a chunk at a time, so memory
+# stays flat however big the table gets.
+@server.route(DOWNLOAD_URL)
+def download_csv():
+    if not is_admin_user():
+        return "Forbidden", 403
+    event = events.resolve(engine, request.args.get("event"))
+
+    def generate():
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(columns)
+        yield buffer.getvalue()
+
+        select = ", ".join(f'"{c}"' for c in columns)
+        try:
+            with engine.connect() as conn:
+                result = conn.execution_options(
+                    stream_results=True, yield_per=DOWNLOAD_CHUNK_ROWS
+                ).execute(
+                    text(f'SELECT {select} FROM responses WHERE "Event" = :event'),
+                    {"event": event},
+                )
+                for chunk in result.partitions():
+                    buffer.seek(0)
+                    buffer.truncate()
+                    writer.writerows(chunk)
+                    yield buffer.getvalue()
+        except Exception:
+            logger.exception("CSV download failed")
+            raise
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype="text/csv",
+        headers={
+            "Content-Disposition": f"attachment; filename=responses-{event}.csv"
+        },
+    )
+
+
+# Connection pool usage, for spotting pool exhaustion under load.
+@server.route("/metrics/pool")
+def pool_metrics():
+    return jsonify(pool_status())
+
+
+# The response count open dashboards poll for. Read from this process's
+# in-memory counts without any database query, so idle dashboards cost
+# nothing but the request; null until the event's counts are loaded here.
+# Counts go up as soon as a batch of submissions commits in this process;
+# other processes' submissions show up on their next count refresh
+# (AGGREGATE_REFRESH_SECONDS).
+@server.route(LIVE_URL)
+def live_responses():
+    event = events.resolve_cached(request.args.get("event"))
+    return jsonify(event=event, responses=peek_total(event))
+
+
+# Latency histograms and the pool numbers, for Prometheus to scrape.
+@server.route("/metrics")
+def prometheus_metrics():
+    gauges = {
+        f"db_pool_{key}": (f"Connection pool {key.replace('_', ' ')}", value)
+        for key, value in pool_status().items()
+        if isinstance(value, (int, float))
+    }
+    return Response(
+        metrics.render(gauges), mimetype="text/plain; version=0.0.4"
+    )
+
+
 @server.route("/logout")
 def logout():
     session.clear()
@@ -1153,6 +1526,47 @@ def ensure_logged_out():
         return redirect("/login?next=/?admin=true")
 
 
+# Heavy imports (pandas, plotly.express, authlib) and the first load of the
+# chart counts happen on first use. LAZY_INIT=false does them at import
+# instead, e.g. so a preforking server pays for them once before forking.
+LAZY_INIT = os.getenv("LAZY_INIT", "true").lower() == "true"
+
+
+def warm_up():
+    import pandas
+    import plotly.express
+
+    get_auth0()
+    try:
+        rebuild_counters(engine, events.current_event(engine))
+    except Exception:
+        logger.exception("Initial chart count load failed")
+
+
+if not LAZY_INIT:
+    warm_up()
+
+
+# Plotly serializes with orjson when it is installed, and the first
+# serialization imports numpy. Two requests doing that at once crashed the
+# process (SIGILL) under loadtest.py, so the first request imports numpy
+# under a lock and any others arriving meanwhile wait for it.
+_numpy_lock = threading.Lock()
+_numpy_imported = not LAZY_INIT
+
+
+@server.before_request
+def import_numpy_once():
+    global _numpy_imported
+    if _numpy_imported:
+        return
+    with _numpy_lock:
+        import numpy
+
+        _numpy_imported = True
+
+
+# Development server. In production run wsgi.py under gunicorn instead.
 if __name__ == "__main__":
     port = int(os.environ.get("PORT", 8050))
     app.run(host="0.0.0.0", port=port, use_reloader=True)
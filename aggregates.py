@@ -0,0 +1,203 @@
+# Counts behind every dashboard chart. One grouped query over all the chart
+# columns returns each distinct combination once; the per-chart counts are
+# then summed up from that in Python. The result is a snapshot dict of
+# column name -> Counter that the chart builders read from.
+#
+# Snapshots are per event (see events.py) and kept in shared_cache for each
+# event that has been viewed, so with a shared CACHE_BACKEND every worker
+# process reads the same counts. A snapshot is loaded from the database on
+# first use, bumped by record_submissions() after each insert, and reloaded
+# every AGGREGATE_REFRESH_SECONDS to pick up outside changes; one worker
+# does the load while any others wait for it. Every change gives the event
+# a new version number, unique across events and workers, which the figure
+# cache keys on.
+#
+# With SUMMARY_TABLE=true the snapshot is read from the response_counts
+# table instead (see summary_table.py), which the database keeps up to date.
+import os
+import time
+from collections import Counter
+
+from sqlalchemy import text
+
+import shared_cache
+
+REFRESH_INTERVAL = float(os.getenv("AGGREGATE_REFRESH_SECONDS", "300"))
+USE_SUMMARY_TABLE = os.getenv("SUMMARY_TABLE", "false").lower() == "true"
+RELOAD_ATTEMPTS = 3
+
+DIMENSIONS = [
+    "Local",
+    "State Code",
+    "Age Range",
+    "Age",
+    "Christ Follower",
+    "Faith Decicion",
+]
+
+_columns = ", ".join(f'"{column}"' for column in DIMENSIONS)
+# Answered from ix_responses_event_dimensions alone.
+SNAPSHOT_QUERY = text(
+    f'SELECT {_columns}, COUNT(*) FROM responses WHERE "Event" = :event '
+    f"GROUP BY {_columns}"
+)
+
+
+def empty_snapshot():
+    return {column: Counter() for column in DIMENSIONS}
+
+
+def load_snapshot(engine, event, use_summary=USE_SUMMARY_TABLE):
+    if use_summary:
+        return summary_snapshot(engine, event)
+    return scan_snapshot(engine, event)
+
+
+def scan_snapshot(engine, event):
+    with engine.connect() as conn:
+        rows = conn.execute(SNAPSHOT_QUERY, {"event": event}).fetchall()
+
+    snapshot = empty_snapshot()
+    for row in rows:
+        count = row[-1]
+        for column, value in zip(DIMENSIONS, row):
+            snapshot[column][value] += count
+    return snapshot
+
+
+# response_counts stores every value as text, with NULL as ''.
+def decode_value(column, value):
+    if value == "":
+        return None
+    if column == "Local":
+        return value.lower() in ("1", "true", "t")
+    if column == "Age":
+        try:
+            return int(value)
+        except ValueError:
+            return value
+    return value
+
+
+def summary_snapshot(engine, event):
+    with engine.connect() as conn:
+        rows = conn.execute(
+            text(
+                "SELECT dimension, value, count FROM response_counts "
+                "WHERE event = :event AND count > 0"
+            ),
+            {"event": event},
+        ).fetchall()
+
+    snapshot = empty_snapshot()
+    for column, value, count in rows:
+        if column in snapshot:
+            snapshot[column][decode_value(column, value)] += count
+    return snapshot
+
+
+# shared_cache key for an event's (snapshot, loaded at, version). Entries
+# are replaced, never changed in place.
+def _key(event):
+    return f"counts:{event}"
+
+
+# How many batches have been recorded for an event. A reload that a batch
+# overtook can't tell whether its query saw that batch, so it is run again
+# rather than risk losing the batch until the next reload.
+def _changes_key(event):
+    return f"changes:{event}"
+
+
+def _new_version():
+    return shared_cache.incr("counts-version")
+
+
+def rebuild_counters(engine, event):
+    for _ in range(RELOAD_ATTEMPTS):
+        changes = shared_cache.get(_changes_key(event), 0)
+        snapshot = load_snapshot(engine, event)
+        with shared_cache.lock(_key(event)):
+            if shared_cache.get(_changes_key(event), 0) != changes:
+                continue
+            entry = shared_cache.get(_key(event))
+            if entry is None or snapshot != entry[0]:
+                version = _new_version()
+            else:
+                version = entry[2]
+            entry = (snapshot, time.time(), version)
+            shared_cache.set(_key(event), entry)
+            return entry
+
+    # Batches kept overtaking the reload. Keep the counts they were added
+    # to, or if there are none, use this load and try again on next use.
+    with shared_cache.lock(_key(event)):
+        entry = shared_cache.get(_key(event))
+        if entry is not None:
+            entry = (entry[0], time.time(), entry[2])
+        else:
+            entry = (snapshot, 0.0, _new_version())
+        shared_cache.set(_key(event), entry)
+    return entry
+
+
+def _entry(engine, event):
+    entry = shared_cache.get(_key(event))
+    if entry is not None and time.time() - entry[1] <= REFRESH_INTERVAL:
+        return entry
+    with shared_cache.lock(f"load:{event}"):
+        # Another worker may have reloaded it while this one waited.
+        entry = shared_cache.get(_key(event))
+        if entry is None or time.time() - entry[1] > REFRESH_INTERVAL:
+            entry = rebuild_counters(engine, event)
+    return entry
+
+
+# The event's current data version, reloading from the database first if
+# due.
+def counters_version(engine, event):
+    return _entry(engine, event)[2]
+
+
+# Returns (version, counts) for the event. The counts are a copy, so
+# callers can change them.
+def get_counters(engine, event):
+    snapshot, _, version = _entry(engine, event)
+    return version, {
+        column: Counter(counts) for column, counts in snapshot.items()
+    }
+
+
+# rows are dicts of column name -> value, as inserted into responses. Each
+# event's snapshot is updated once for the whole batch.
+def record_submissions(rows):
+    by_event = {}
+    for row in rows:
+        by_event.setdefault(row.get("Event"), []).append(row)
+    for event, event_rows in by_event.items():
+        with shared_cache.lock(_key(event)):
+            changes = shared_cache.get(_changes_key(event), 0)
+            shared_cache.set(_changes_key(event), changes + 1)
+            entry = shared_cache.get(_key(event))
+            if entry is None:
+                continue
+            snapshot = {
+                column: Counter(counts) for column, counts in entry[0].items()
+            }
+            for row in event_rows:
+                for column in DIMENSIONS:
+                    snapshot[column][row[column]] += 1
+            shared_cache.set(_key(event), (snapshot, entry[1], _new_version()))
+
+
+def record_submission(row):
+    record_submissions([row])
+
+
+# How many responses the event has, from the cache without refreshing, or
+# None if no worker has loaded the event. Cheap enough to poll.
+def peek_total(event):
+    entry = shared_cache.get(_key(event))
+    if entry is None:
+        return None
+    return sum(entry[0][DIMENSIONS[0]].values())
@@ -0,0 +1,97 @@
+// Clientside callbacks for interactions that only change what is shown.
+// They run in the browser, so they don't cost a request to the server.
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+  ui: {
+    // Show or hide the chart menu when "Select Chart" is clicked.
+    toggleNav: function (nClicks, currentStyle) {
+      if (!nClicks) {
+        return window.dash_clientside.no_update;
+      }
+      if (!currentStyle) {
+        return { display: "flex" };
+      }
+      const newStyle = Object.assign({}, currentStyle);
+      newStyle.display = newStyle.display === "none" ? "flex" : "none";
+      return newStyle;
+    },
+
+    // Hide the menu and request the chart for the button that was clicked.
+    selectChart: function (nClicksList) {
+      const ctx = window.dash_clientside.callback_context;
+      const clicked = ctx.triggered.some(function (t) {
+        return t.value;
+      });
+      if (!ctx.triggered_id || !clicked) {
+        throw window.dash_clientside.PreventUpdate;
+      }
+      return [{ display: "none" }, ctx.triggered_id.value];
+    },
+
+    // Asks /live/responses how many responses the event has and returns
+    // [count, refresh]. refresh is set only when the count went up since
+    // the last answer, so the chart is redrawn once per change; a lower
+    // count, from a process that hasn't caught up yet, is ignored. Hidden
+    // tabs don't ask.
+    pollResponses: async function (nIntervals, eventKey, lastCount) {
+      const noUpdate = [
+        window.dash_clientside.no_update,
+        window.dash_clientside.no_update,
+      ];
+      if (document.hidden) {
+        return noUpdate;
+      }
+      const query = eventKey ? "?event=" + encodeURIComponent(eventKey) : "";
+      let count;
+      try {
+        const response = await fetch("/live/responses" + query);
+        count = (await response.json()).responses;
+      } catch (e) {
+        return noUpdate;
+      }
+      if (count == null || (lastCount != null && count <= lastCount)) {
+        return noUpdate;
+      }
+      if (lastCount == null) {
+        return [count, window.dash_clientside.no_update];
+      }
+      return [count, count];
+    },
+
+    showCodeInput: function (n) {
+      return { display: "inline-block", marginTop: "10px" };
+    },
+
+    isAdminQuery: function (search) {
+      const admin = new URLSearchParams(search || "").get("admin") || "false";
+      return admin.toLowerCase() === "true";
+    },
+
+    // The ?event= key, or null for the current event.
+    eventQuery: function (search) {
+      return new URLSearchParams(search || "").get("event");
+    },
+
+    // Login/Logout link, only shown on ?admin=true.
+    authButtons: function (search, loggedIn) {
+      if (!window.dash_clientside.ui.isAdminQuery(search)) {
+        return "";
+      }
+      if (loggedIn) {
+        return {
+          type: "A",
+          namespace: "dash_html_components",
+          props: {
+            children: "Logout",
+            href: "/logout",
+            style: { marginRight: "10px" },
+          },
+        };
+      }
+      return {
+        type: "A",
+        namespace: "dash_html_components",
+        props: { children: "Login", href: "/login?next=/?admin=true" },
+      };
+    },
+  },
+});
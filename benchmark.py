@@ -0,0 +1,887 @@
+# Small benchmarks for the dashboard. Run one with:
+#   python benchmark.py <name>
+# and run `python benchmark.py` with no name to list them. Benchmarks that
+# need the app run it against DATABASE_URL, or a throwaway SQLite database
+# in the temp directory if that isn't set.
+import importlib.util
+import itertools
+import json
+import os
+import random
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+APP_PATH = os.path.join(HERE, "EasterDash0.1.py")
+BENCH_DB = os.path.join(tempfile.gettempdir(), "easterdash_bench.db")
+
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def report(name, samples):
+    samples = sorted(samples)
+    p95 = samples[int(len(samples) * 0.95) - 1] if len(samples) > 1 else samples[0]
+    print(
+        f"{name:<32} n={len(samples):<6} "
+        f"mean={statistics.mean(samples) * 1000:.3f}ms "
+        f"p50={statistics.median(samples) * 1000:.3f}ms "
+        f"p95={p95 * 1000:.3f}ms"
+    )
+
+
+def fake_rows(count):
+    import geo
+    from submissions import bin_age
+
+    states = [o["value"] for o in geo.get_state_options("United States")]
+    rows = []
+    for i in range(count):
+        age = random.randint(10, 80)
+        state = random.choice(states)
+        rows.append(
+            {
+                "name": f"Visitor {i}",
+                "age_range": bin_age(age),
+                "age": age,
+                "local": state == "District of Columbia",
+                "country": "United States",
+                "state": state,
+                "christ_follower": random.choice(["Yes", "No"]),
+                "faith_decicion": random.choice(["Yes", "No"]),
+                "how_found": "",
+            }
+        )
+    return rows
+
+
+# Recreates responses in its original layout, so the app's schema updates
+# run against it, and fills it with `rows` random submissions. The tables
+# derived from it are dropped, so they are rebuilt from the new rows.
+def seed_database(engine, rows):
+    from sqlalchemy import text
+
+    with engine.begin() as conn:
+        for table in ("responses", "response_buckets", "response_counts", "events"):
+            conn.execute(text(f"DROP TABLE IF EXISTS {table}"))
+        conn.execute(text("""
+            CREATE TABLE responses (
+                "Name" TEXT, "Age Range" TEXT, "Age" INTEGER, "Local" BOOLEAN,
+                "Country" TEXT, "State" TEXT, "Christ Follower" TEXT,
+                "Faith Decicion" TEXT, "How you found us?" TEXT
+            )
+        """))
+        if rows:
+            conn.execute(
+                text("""
+                    INSERT INTO responses (
+                        "Name", "Age Range", "Age", "Local", "Country", "State",
+                        "Christ Follower", "Faith Decicion", "How you found us?"
+                    )
+                    VALUES (
+                        :name, :age_range, :age, :local, :country, :state,
+                        :christ_follower, :faith_decicion, :how_found
+                    )
+                """),
+                fake_rows(rows),
+            )
+
+
+def prepare_database(rows):
+    from sqlalchemy import create_engine
+
+    os.environ.setdefault("DATABASE_URL", f"sqlite:///{BENCH_DB}")
+    seed_database(create_engine(os.environ["DATABASE_URL"]), rows)
+
+
+# Imports EasterDash0.1.py, which isn't importable by name. Submissions
+# made by a benchmark are spooled to a throwaway directory rather than the
+# app's own spool, where a real run would adopt and write them.
+def import_app():
+    os.environ.setdefault("WRITE_SPOOL_DIR", tempfile.mkdtemp())
+    spec = importlib.util.spec_from_file_location("easterdash", APP_PATH)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules["easterdash"] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+def load_app(rows=1000):
+    prepare_database(rows)
+    return import_app()
+
+
+# Finds a callback by its outputs. `output` is "id.prop", or a list of them
+# for callbacks with several outputs; `keys` are the registered output
+# strings. Outputs registered with allow_duplicate carry a hash suffix, so
+# they are matched without it. Returns the key and the outputs spec the
+# browser would send.
+def find_callback(keys, output):
+    def spec(name):
+        id_, prop = name.rsplit(".", 1)
+        return {"id": id_, "property": prop}
+
+    names = [output] if isinstance(output, str) else list(output)
+    for key in keys:
+        registered = key.strip(".").split("...") if key.startswith("..") else [key]
+        if [re.sub(r"@[0-9a-f]+$", "", r) for r in registered] == names:
+            break
+    else:
+        raise KeyError(f"No callback for {names}")
+
+    if isinstance(output, str):
+        return key, spec(registered[0])
+    return key, [spec(r) for r in registered]
+
+
+# The JSON body of a /_dash-update-component request. `inputs` and `state`
+# are (id, prop, value) tuples, or lists of them for a wildcard (ALL) id;
+# `changed` is the "id.prop" of the inputs that triggered it, all of them
+# by default.
+def update_body(key, outputs, inputs, state=(), changed=None):
+    def props(items):
+        return [
+            props(item) if isinstance(item, list)
+            else {"id": item[0], "property": item[1], "value": item[2]}
+            for item in items
+        ]
+
+    return {
+        "output": key,
+        "outputs": outputs,
+        "inputs": props(inputs),
+        "changedPropIds": changed or [f"{i}.{p}" for i, p, _ in inputs],
+        "state": props(state),
+    }
+
+
+# Calls one Dash callback the way the browser does, through a Flask test
+# client.
+def dash_update(app, client, output, inputs, state=(), changed=None):
+    if not app.app.callback_map:
+        client.get("/_dash-layout")
+    key, outputs = find_callback(app.app.callback_map, output)
+    response = client.post(
+        "/_dash-update-component",
+        data=json.dumps(update_body(key, outputs, inputs, state, changed)),
+        content_type="application/json",
+    )
+    assert response.status_code in (200, 204), response.status_code
+    return response
+
+
+# A local HTTP server standing in for an outside API. `routes` maps a path
+# to a function returning (status, body); the function may sleep to play a
+# slow upstream. Returns the server's base URL, a Counter of hits per path
+# and the set of client ports seen (one per kept-alive connection).
+def start_stub_server(routes):
+    hits = Counter()
+    connections = set()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        disable_nagle_algorithm = True
+
+        def do_GET(self):
+            hits[self.path] += 1
+            connections.add(self.client_address[1])
+            try:
+                status, body = routes[self.path]()
+            except KeyError:
+                status, body = 404, b""
+            except (BrokenPipeError, ConnectionResetError):
+                return
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            try:
+                self.wfile.write(body)
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_port}", hits, connections
+
+
+# Cold start: a fresh interpreter importing geo, which loads the bundled
+# country list. Then the per-render cost of getting the list.
+def bench_countries():
+    def cold_import():
+        subprocess.run(
+            [sys.executable, "-c", "import geo"], cwd=HERE, check=True
+        )
+
+    def baseline():
+        subprocess.run([sys.executable, "-c", "import requests"], check=True)
+
+    report("interpreter + requests", timed(baseline, 10))
+    report("interpreter + geo (cold start)", timed(cold_import, 10))
+
+    import geo
+
+    report("load_countries()", timed(geo.load_countries, 200))
+    report("get_country_list()", timed(geo.get_country_list, 10000))
+
+
+# The state dropdown callback is a lookup in the bundled index. Fails if
+# the p99 lookup is a millisecond or more.
+def bench_states():
+    import geo
+
+    countries = itertools.cycle(geo.get_country_list())
+
+    def lookup():
+        geo.get_state_options(next(countries))
+
+    samples = sorted(timed(lookup, 50000))
+    report("get_state_options()", samples)
+    assert samples[int(len(samples) * 0.99)] < 0.001, "state lookup over 1ms"
+    assert geo.get_state_options("United States"), "no US states bundled"
+
+
+# Switching charts through the real callback endpoint, which is what a
+# visitor clicking the chart buttons waits on.
+def bench_chart_switch(rows=5000):
+    app = load_app(rows)
+    client = app.server.test_client()
+
+    for chart_type in app.CHART_TYPES + ["data"]:
+        def switch():
+            dash_update(
+                app,
+                client,
+                "chart-output.children",
+                [("chart-request", "data", chart_type), ("live-refresh", "data", None)],
+                [("event-key", "data", None), []],
+                ["chart-request.data"],
+            )
+
+        report(f"chart switch: {chart_type}", timed(switch, 20))
+
+
+# Submission throughput: one INSERT and commit per request (the old path)
+# against the write-behind queue, both on a local SQLite database.
+def bench_writes(count=2000):
+    from sqlalchemy import column, create_engine, insert, table
+
+    os.environ.setdefault("WRITE_SPOOL_DIR", tempfile.mkdtemp())
+    import schema
+    import write_queue
+
+    engine = create_engine(f"sqlite:///{BENCH_DB}")
+    seed_database(engine, 0)
+    schema.ensure_responses(engine, "current")
+    rows = [
+        {
+            "Name": r["name"], "Age Range": r["age_range"], "Age": r["age"],
+            "Local": r["local"], "Country": r["country"], "State": r["state"],
+            "Christ Follower": r["christ_follower"],
+            "Faith Decicion": r["faith_decicion"],
+            "How you found us?": r["how_found"],
+        }
+        for r in fake_rows(count)
+    ]
+    responses = table("responses", *(column(c) for c in rows[0]))
+
+    start = time.perf_counter()
+    for row in rows:
+        with engine.begin() as conn:
+            conn.execute(insert(responses), row)
+    direct = time.perf_counter() - start
+    print(f"direct insert per row      {count / direct:10.0f} rows/s")
+
+    seed_database(engine, 0)
+    schema.ensure_responses(engine, "current")
+    write_queue.configure(engine)
+    start = time.perf_counter()
+    for row in rows:
+        write_queue.submit(row)
+    acked = time.perf_counter() - start
+    write_queue.flush()
+    flushed = time.perf_counter() - start
+    print(f"write-behind acknowledged  {count / acked:10.0f} rows/s")
+    print(f"write-behind committed     {count / flushed:10.0f} rows/s")
+
+    with engine.connect() as conn:
+        stored = conn.exec_driver_sql("SELECT COUNT(*) FROM responses").scalar()
+    assert stored == count, f"expected {count} rows, found {stored}"
+
+
+# Chart snapshot and a filtered "View Data" page for one event at growing
+# row counts, on the original untyped table and again after migrating it to
+# the typed, indexed schema. Half the rows belong to an earlier event.
+def bench_schema(sizes=(1000, 10000, 100000)):
+    from sqlalchemy import create_engine, text
+
+    import aggregates
+    import geo
+    import schema
+    from table_query import fetch_page
+
+    engine = create_engine(f"sqlite:///{BENCH_DB}")
+    columns = [c.name for c in schema.responses.columns if c.name != "id"]
+
+    def page():
+        fetch_page(
+            engine, columns, 0, 25, [{"column_id": "Age", "direction": "desc"}],
+            "{Age Range} = 18-25 && {Christ Follower} = Yes", "current",
+        )
+
+    def snapshot():
+        aggregates.scan_snapshot(engine, "current")
+
+    for rows in sizes:
+        seed_database(engine, rows)
+        # The untyped table with state codes and events, but no index.
+        with engine.begin() as conn:
+            conn.execute(text('ALTER TABLE responses ADD COLUMN "State Code" TEXT'))
+            conn.execute(text('ALTER TABLE responses ADD COLUMN "Event" TEXT'))
+            conn.execute(text(
+                'UPDATE responses SET "Event" = '
+                "CASE WHEN rowid % 2 THEN 'current' ELSE 'earlier' END"
+            ))
+            for option in geo.get_state_options("United States"):
+                conn.execute(
+                    text('UPDATE responses SET "State Code" = :code WHERE "State" = :state'),
+                    {"code": geo.state_code(option["value"]), "state": option["value"]},
+                )
+        report(f"{rows} rows untyped: snapshot", timed(snapshot, 10))
+        report(f"{rows} rows untyped: data page", timed(page, 10))
+
+        start = time.perf_counter()
+        schema.ensure_schema(engine)
+        print(f"migration took {time.perf_counter() - start:.2f}s")
+        report(f"{rows} rows typed: snapshot", timed(snapshot, 10))
+        report(f"{rows} rows typed: data page", timed(page, 10))
+
+
+# The CSV import on a generated file of `rows` responses, loaded into an
+# empty table.
+def bench_import(rows=100000):
+    import csv
+
+    from sqlalchemy import create_engine
+
+    import import_csv
+    import schema
+
+    path = os.path.join(tempfile.gettempdir(), "easterdash_import.csv")
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow([c for c in import_csv.COLUMNS if c != "State Code"])
+        for r in fake_rows(rows):
+            writer.writerow([
+                r["name"], r["age_range"], r["age"], r["local"], r["country"],
+                r["state"], r["christ_follower"], r["faith_decicion"],
+                r["how_found"],
+            ])
+
+    engine = create_engine(os.getenv("DATABASE_URL", f"sqlite:///{BENCH_DB}"))
+    seed_database(engine, 0)
+    schema.ensure_schema(engine)
+    with open(path, newline="", encoding="utf-8") as f:
+        loaded, errors, seconds = import_csv.load(engine, f)
+    print(f"{loaded} rows in {seconds:.2f}s ({loaded / seconds:.0f} rows/s)")
+    assert loaded == rows and not errors, errors[:5]
+
+
+# The shared HTTP client against stub upstreams: connection reuse, the
+# cache TTL, timeouts and retries on a slow or failing host, the circuit
+# breaker, and falling back to cached data. Fails on the first check that
+# doesn't hold.
+def bench_http():
+    import http_client
+
+    http_client.READ_TIMEOUT = 0.2
+    http_client.BACKOFF = 0.01
+    http_client.BREAKER_RESET = 0.5
+    http_client._session = None
+    http_client.reset()
+
+    state = {"flaky_ok": True}
+
+    def slow():
+        time.sleep(1)
+        return 200, b"[]"
+
+    base, hits, connections = start_stub_server({
+        "/ok": lambda: (200, b'{"ok": true}'),
+        "/slow": slow,
+        "/fail": lambda: (500, b""),
+        "/flaky": lambda: (200, b'"fresh"') if state["flaky_ok"] else (503, b""),
+    })
+
+    report("get_json() uncached", timed(lambda: http_client.get_json(base + "/ok", ttl=0), 200))
+    assert len(connections) == 1, f"{len(connections)} connections for 200 calls"
+    print("keep-alive: 200 calls over 1 connection")
+
+    before = hits["/ok"]
+    report("get_json() cached", timed(lambda: http_client.get_json(base + "/ok", ttl=0.3), 1000))
+    assert hits["/ok"] == before + 1, "cache did not hold within the TTL"
+    time.sleep(0.35)
+    http_client.get_json(base + "/ok", ttl=0.3)
+    assert hits["/ok"] == before + 2, "cache did not expire after the TTL"
+    print("TTL: one call while fresh, another once expired")
+
+    start = time.perf_counter()
+    try:
+        http_client.get_json(base + "/slow")
+        raise AssertionError("slow upstream did not time out")
+    except http_client.requests.RequestException:
+        pass
+    print(
+        f"slow upstream: gave up after {time.perf_counter() - start:.2f}s "
+        f"and {hits['/slow']} attempts"
+    )
+    assert hits["/slow"] == http_client.RETRIES + 1
+
+    # The breaker is per host, and every route here is on the same one.
+    http_client.reset()
+    for _ in range(http_client.BREAKER_FAILURES):
+        try:
+            http_client.get_json(base + "/fail")
+        except http_client.requests.RequestException:
+            pass
+    failed_calls = hits["/fail"]
+    try:
+        http_client.get_json(base + "/fail")
+        raise AssertionError("breaker did not open")
+    except http_client.CircuitOpen:
+        pass
+    assert hits["/fail"] == failed_calls, "open breaker still called upstream"
+    print(
+        f"breaker: open after {http_client.BREAKER_FAILURES} failed calls "
+        f"({failed_calls} requests with retries), upstream skipped"
+    )
+
+    http_client.reset()
+    assert http_client.get_json(base + "/flaky", ttl=0) == "fresh"
+    state["flaky_ok"] = False
+    assert http_client.get_json(base + "/flaky", ttl=0) == "fresh"
+    print("fallback: failing upstream served from the cache")
+
+    for _ in range(http_client.BREAKER_FAILURES - 1):
+        http_client.get_json(base + "/flaky", ttl=0)
+    assert http_client.get_breaker(base + "/flaky").opened_at is not None
+
+    time.sleep(http_client.BREAKER_RESET)
+    state["flaky_ok"] = True
+    calls = hits["/flaky"]
+    assert http_client.get_json(base + "/flaky", ttl=0) == "fresh"
+    assert hits["/flaky"] == calls + 1, "no trial call after the reset time"
+    assert http_client.get_breaker(base + "/flaky").opened_at is None
+    print("breaker: closes again once the host recovers")
+
+
+# The "Over time" chart's query against grouping the raw timestamps, with
+# `rows` responses spread over three Easter weekends, one event each, all
+# named "Easter".
+def bench_over_time(rows=200000):
+    from datetime import datetime, timedelta
+
+    from sqlalchemy import create_engine, text
+
+    import events
+    import schema
+    import time_buckets
+    from submissions import build_row
+
+    engine = create_engine(f"sqlite:///{BENCH_DB}")
+    seed_database(engine, 0)
+    schema.ensure_schema(engine)
+
+    easters = [datetime(2024, 3, 31, 9), datetime(2025, 4, 20, 9), datetime(2026, 4, 5, 9)]
+    for easter in easters:
+        events.start_event(
+            engine, f"easter-{easter.year}", "Easter", easter - timedelta(days=2)
+        )
+    batch = []
+    with engine.begin() as conn:
+        for i, r in enumerate(fake_rows(rows)):
+            easter = random.choice(easters)
+            submitted_at = easter + timedelta(
+                days=random.choice([-2, 0, 0, 0]), seconds=random.randint(0, 4 * 3600)
+            )
+            batch.append(build_row(
+                r["name"], r["age"], r["christ_follower"], r["faith_decicion"],
+                r["how_found"], r["country"], r["state"], submitted_at,
+                f"easter-{easter.year}",
+            ))
+            if len(batch) == 5000 or i == rows - 1:
+                conn.execute(schema.responses.insert(), batch)
+                time_buckets.add_rows(conn, batch)
+                batch = []
+
+    def scan():
+        with engine.connect() as conn:
+            conn.execute(text(
+                """SELECT strftime('%Y-%m-%d', "Submitted At"), COUNT(*) """
+                """FROM responses WHERE "Event" LIKE 'easter-%' """
+                'AND "Submitted At" IS NOT NULL GROUP BY 1'
+            )).fetchall()
+
+    keys = events.same_name(engine, "easter-2026")
+    assert keys == ["easter-2024", "easter-2025", "easter-2026"], keys
+    granularity, series = time_buckets.load_series(engine, keys)
+    print(f"{rows} rows -> {len(series)} {granularity} buckets")
+    report("timestamp scan (day)", timed(scan, 10))
+    report("bucket read", timed(lambda: time_buckets.load_series(engine, keys), 100))
+
+
+# The current event's chart snapshot and data page with `history` rows
+# from ten earlier events in the table, against grouping the whole table
+# as the charts did before events; then starting a new event.
+def bench_events(history=200000, current=5000):
+    from datetime import datetime
+
+    from sqlalchemy import create_engine, text
+
+    import aggregates
+    import events
+    import schema
+    from submissions import build_row
+    from table_query import fetch_page
+
+    engine = create_engine(f"sqlite:///{BENCH_DB}")
+    seed_database(engine, 0)
+    schema.ensure_schema(engine)
+
+    keys = [f"easter-{year}" for year in range(2015, 2025)]
+    for year, key in zip(range(2015, 2025), keys):
+        events.start_event(engine, key, started_at=datetime(year, 4, 1))
+    events.start_event(engine, "easter-2026")
+    assert events.current_event(engine) == "easter-2026"
+
+    with engine.begin() as conn:
+        for count, event_keys in ((history, keys), (current, ["easter-2026"])):
+            conn.execute(schema.responses.insert(), [
+                build_row(
+                    r["name"], r["age"], r["christ_follower"], r["faith_decicion"],
+                    r["how_found"], r["country"], r["state"], None,
+                    random.choice(event_keys),
+                )
+                for r in fake_rows(count)
+            ])
+
+    columns = ", ".join(f'"{c}"' for c in aggregates.DIMENSIONS)
+
+    def whole_table():
+        with engine.connect() as conn:
+            conn.execute(text(
+                f"SELECT {columns}, COUNT(*) FROM responses GROUP BY {columns}"
+            )).fetchall()
+
+    def page():
+        fetch_page(
+            engine, ["Name", "Age"], 0, 25,
+            [{"column_id": "Age", "direction": "desc"}], "", "easter-2026",
+        )
+
+    total = history + current
+    report(f"{total} rows: whole table", timed(whole_table, 10))
+    report(
+        f"{total} rows: current event",
+        timed(lambda: aggregates.scan_snapshot(engine, "easter-2026"), 10),
+    )
+    report(f"{total} rows: data page", timed(page, 10))
+
+    snapshot = aggregates.scan_snapshot(engine, "easter-2026")
+    assert sum(snapshot["Local"].values()) == current
+    report("start new event", timed(lambda: events.start_event(engine), 1))
+    new = events.current_event(engine)
+    assert not any(aggregates.scan_snapshot(engine, new).values())
+    with engine.connect() as conn:
+        kept = conn.execute(text("SELECT COUNT(*) FROM responses")).scalar()
+    assert kept == total, f"expected {total} rows kept, found {kept}"
+    print(f"new event {new} starts empty; {kept} earlier rows kept")
+
+
+# Clicking a state on the map: the breakdowns from the in-memory cube
+# against the grouped query they would otherwise need, checked against it
+# for every state, then through the callback endpoint. Fails if the cube
+# and the database disagree, before or after new submissions are added.
+def bench_drill_down(rows=50000):
+    from sqlalchemy import text
+
+    import aggregates
+    import cube
+    import events
+
+    app = load_app(rows)
+    engine = app.engine
+    event = events.current_event(engine)
+    codes = [code for code in app.US_STATE_NAMES]
+    columns = ", ".join(f'"{c}"' for c in aggregates.DIMENSIONS)
+    query = text(
+        f"SELECT {columns}, COUNT(*) FROM responses "
+        f'WHERE "Event" = :event AND "State Code" = :code GROUP BY {columns}'
+    )
+
+    def from_sql(code):
+        snapshot = aggregates.empty_snapshot()
+        with engine.connect() as conn:
+            for row in conn.execute(query, {"event": event, "code": code}):
+                for column, value in zip(aggregates.DIMENSIONS, row):
+                    snapshot[column][value] += row[-1]
+        return snapshot
+
+    def from_cube(code):
+        return cube.filtered_counts(engine, event, {"State Code": code})[1]
+
+    def check():
+        for code in codes:
+            expected = {c: +counts for c, counts in from_sql(code).items()}
+            assert from_cube(code) == expected, f"cube differs for {code}"
+
+    report("cube load", timed(lambda: cube.rebuild_cube(engine, event), 5))
+    check()
+    print(f"cube matches SQL for {len(codes)} states")
+    states = itertools.cycle(codes)
+    report("per click: SQL", timed(lambda: from_sql(next(states)), 200))
+    report("per click: cube", timed(lambda: from_cube(next(states)), 200))
+
+    import write_queue
+    from submissions import build_row
+
+    for r in fake_rows(500):
+        write_queue.submit(build_row(
+            r["name"], r["age"], r["christ_follower"], r["faith_decicion"],
+            r["how_found"], r["country"], r["state"], None, event,
+        ))
+    write_queue.flush()
+    check()
+    print("cube still matches after 500 submissions")
+
+    client = app.server.test_client()
+
+    def click():
+        dash_update(
+            app, client, "drill-down.children",
+            [(app.STATE_MAP, "clickData", {"points": [{"location": next(states)}]})],
+            [("event-key", "data", None)],
+        )
+
+    report("drill-down callback", timed(click, 100))
+
+
+# A dashboard left open: the poll it makes every LIVE_POLL_SECONDS, which
+# must not touch the database, then one submission and the chart redraw
+# the poll triggers.
+def bench_live(rows=5000):
+    import metrics
+
+    app = load_app(rows)
+    import write_queue
+
+    client = app.server.test_client()
+
+    # On a live refresh the page already shows the chart's graphs.
+    def chart(refresh=None, chart_type="local", graph_ids=None):
+        if graph_ids is None:
+            graph_ids = [app.chart_graph_id(chart_type)] if refresh else []
+        return dash_update(
+            app, client, "chart-output.children",
+            [("chart-request", "data", chart_type), ("live-refresh", "data", refresh)],
+            [("event-key", "data", None), [(i, "id", i) for i in graph_ids]],
+            ["live-refresh.data" if refresh else "chart-request.data"],
+        )
+
+    def sql_statements():
+        return sum(count for count, _ in metrics.totals("sql_duration_seconds").values())
+
+    def poll():
+        return client.get(app.LIVE_URL).get_json()["responses"]
+
+    chart()
+    before = sql_statements()
+    report("poll", timed(poll, 1000))
+    assert sql_statements() == before, "polling ran SQL"
+    print("1000 polls, no SQL")
+
+    count = poll()
+    dash_update(
+        app, client,
+        ["chart-request.data", "submission-store.data",
+         "form-error.children", "loading-flag.data"],
+        [("submit-button", "n_clicks", 1)],
+        [
+            ("inpu", "value", "Live"), ("age-slider", "value", 30),
+            ("christian-status", "value", "Yes"),
+            ("faith-decicion", "value", "No"), ("how-they-found-us", "value", ""),
+            ("country-dropdown", "value", "United States"),
+            ("state-dropdown", "value", "Ohio"), ("event-key", "data", None),
+        ],
+    )
+    write_queue.flush()
+    assert poll() == count + 1, "submission not seen by the poll"
+    report("redraw after a submission", timed(lambda: chart(count + 1), 1))
+    report("redraw, already built", timed(lambda: chart(count + 1), 20))
+    response = chart(count + 1, "data", [])
+    assert response.status_code == 204, "data table was redrawn"
+
+    # Only the map's figure is sent, so an open drill-down below it stays.
+    patch = chart(count + 1, "state_map").get_json()["response"]["chart-output"]["children"]
+    assert patch.get("__dash_patch_update"), "state map was redrawn"
+    paths = [operation["location"] for operation in patch["operations"]]
+    assert all("figure" in path for path in paths), paths
+    print(f"state map refresh: {len(json.dumps(patch))} bytes of patch")
+    # A page without the graphs (no data yet) gets the whole chart.
+    response = chart(count + 1, "local", []).get_json()
+    assert "__dash_patch_update" not in response["response"]["chart-output"]["children"]
+
+
+def wait_until_up(base_url, timeout=60):
+    import requests
+
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            requests.get(base_url + "/_dash-layout", timeout=5).raise_for_status()
+            return
+        except requests.RequestException:
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(0.2)
+
+
+# Load test throughput by number of gunicorn workers (see wsgi.py), the
+# workers sharing a filesystem cache, against one seeded SQLite database.
+# Afterwards every worker must report the same response count, including
+# the submissions made through the others.
+def bench_workers(counts=(1, 2, 4), visitors=100, concurrency=16, rows=5000):
+    import socket
+
+    import requests
+
+    import loadtest
+
+    print(f"{os.cpu_count()} CPUs, {visitors} visitors, {concurrency} at a time")
+    for workers in counts:
+        prepare_database(rows)
+        with socket.socket() as s:
+            s.bind(("127.0.0.1", 0))
+            port = s.getsockname()[1]
+        env = {
+            **os.environ,
+            "PORT": str(port),
+            "WEB_WORKERS": str(workers),
+            "WEB_THREADS": "4",
+            "LAZY_INIT": "false",
+            "CACHE_BACKEND": "filesystem",
+            "CACHE_DIR": tempfile.mkdtemp(),
+            "WRITE_SPOOL_DIR": tempfile.mkdtemp(),
+            "LOG_LEVEL": "WARNING",
+        }
+        env.pop("COUNTRY_REFRESH_INTERVAL", None)
+        server = subprocess.Popen(
+            [sys.executable, "-m", "gunicorn", "wsgi:server"], cwd=HERE, env=env
+        )
+        base_url = f"http://127.0.0.1:{port}"
+        try:
+            wait_until_up(base_url)
+            samples, elapsed, errors = loadtest.run_visitors(
+                base_url, visitors, concurrency
+            )
+            assert not errors, f"{len(errors)} visitors failed: {errors[0]!r}"
+            latencies = sorted(v for values in samples.values() for v in values)
+            print(
+                f"workers={workers:<3} requests={len(latencies):<6} "
+                f"req/s={len(latencies) / elapsed:.1f} "
+                f"p50={statistics.median(latencies) * 1000:.1f}ms "
+                f"p95={loadtest.percentile(latencies, 0.95) * 1000:.1f}ms"
+            )
+
+            time.sleep(2)  # for the write queues to flush
+            totals = {
+                requests.get(base_url + "/live/responses", timeout=10).json()["responses"]
+                for _ in range(8 * workers)
+            }
+            assert totals == {rows + visitors}, f"workers disagree: {totals}"
+        finally:
+            server.terminate()
+            server.wait()
+
+
+STARTUP_SCRIPT = """
+import json, time
+import benchmark
+
+benchmark.prepare_database(1000)
+start = time.perf_counter()
+app = benchmark.import_app()
+imported = time.perf_counter()
+client = app.server.test_client()
+client.get("/_dash-layout")
+layout = time.perf_counter()
+benchmark.dash_update(
+    app, client, "chart-output.children",
+    [("chart-request", "data", "local"), ("live-refresh", "data", None)],
+    [("event-key", "data", None), []], ["chart-request.data"],
+)
+chart = time.perf_counter()
+print(json.dumps([imported - start, layout - imported, chart - layout]))
+"""
+
+
+# App import time and the first requests after it, each in a fresh
+# interpreter, with and without LAZY_INIT.
+def bench_startup(repeat=5):
+    for lazy in ("true", "false"):
+        results = []
+        for _ in range(repeat):
+            out = subprocess.run(
+                [sys.executable, "-c", STARTUP_SCRIPT],
+                cwd=HERE,
+                env={**os.environ, "LAZY_INIT": lazy},
+                check=True,
+                capture_output=True,
+                text=True,
+            ).stdout
+            results.append(json.loads(out.strip().splitlines()[-1]))
+        imports, layouts, charts = zip(*results)
+        report(f"LAZY_INIT={lazy} import", imports)
+        report(f"LAZY_INIT={lazy} first layout", layouts)
+        report(f"LAZY_INIT={lazy} first chart", charts)
+
+
+BENCHMARKS = {
+    "countries": bench_countries,
+    "states": bench_states,
+    "chart-switch": bench_chart_switch,
+    "writes": bench_writes,
+    "schema": bench_schema,
+    "import": bench_import,
+    "http": bench_http,
+    "over-time": bench_over_time,
+    "events": bench_events,
+    "drill-down": bench_drill_down,
+    "live": bench_live,
+    "workers": bench_workers,
+    "startup": bench_startup,
+}
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1] not in BENCHMARKS:
+        print("Usage: python benchmark.py <" + "|".join(BENCHMARKS) + ">")
+        sys.exit(1)
+    BENCHMARKS[sys.argv[1]]()
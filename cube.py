@@ -0,0 +1,173 @@
+# In-memory cube of the chart columns, for cross-filtered drill-downs such
+# as "ages and faith decisions in Texas". Each event's cube holds one row per
+# distinct combination of DIMENSIONS: an integer code per column (an index
+# into that column's list of values) and how many responses have it. It is
+# loaded with the same grouped query as the chart snapshot, so a few
+# thousand rows stand for any number of responses.
+#
+# Filtering is a NumPy mask over the codes and each breakdown one bincount,
+# so a drill-down is answered in-process with no SQL. Submissions are added
+# as they are written (record_submission), and cubes are reloaded every
+# AGGREGATE_REFRESH_SECONDS like the chart counts. A cube is only built for
+# an event once a drill-down asks for it.
+#
+# Unlike the chart counts, cubes stay in each worker process: they are
+# quick to load, and a drill-down reads a cube far more often than it
+# changes. Their versions come from shared_cache all the same, so drill-down
+# charts that different workers put in a shared figure cache never collide.
+#
+# NumPy is imported on first use, like pandas in the chart builders.
+import threading
+import time
+from collections import Counter
+
+import shared_cache
+from aggregates import (
+    DIMENSIONS,
+    REFRESH_INTERVAL,
+    RELOAD_ATTEMPTS,
+    SNAPSHOT_QUERY,
+)
+
+INITIAL_CAPACITY = 1024
+
+
+class Cube:
+    # rows are (value per DIMENSIONS..., count), each combination once, as
+    # SNAPSHOT_QUERY returns them.
+    def __init__(self, rows=()):
+        import numpy as np
+
+        # Per column: code -> value, and value -> code.
+        self.values = [[] for _ in DIMENSIONS]
+        self.codes_of = [{} for _ in DIMENSIONS]
+        columns = list(zip(*rows)) or [()] * (len(DIMENSIONS) + 1)
+        codes = [
+            [self._code(i, value) for value in column]
+            for i, column in enumerate(columns[:-1])
+        ]
+        # Combination of codes -> its row.
+        self.rows = {key: row for row, key in enumerate(zip(*codes))}
+        self.size = len(self.rows)
+
+        capacity = max(INITIAL_CAPACITY, 2 * self.size)
+        self.codes = np.zeros((capacity, len(DIMENSIONS)), dtype=np.int32)
+        self.counts = np.zeros(capacity, dtype=np.int64)
+        if self.size:
+            self.codes[: self.size] = np.array(codes, dtype=np.int32).T
+            self.counts[: self.size] = columns[-1]
+
+    def _code(self, i, value):
+        code = self.codes_of[i].get(value)
+        if code is None:
+            code = self.codes_of[i][value] = len(self.values[i])
+            self.values[i].append(value)
+        return code
+
+    # Adds `count` responses with the given values, one per DIMENSIONS.
+    def add(self, values, count=1):
+        import numpy as np
+
+        key = tuple(self._code(i, value) for i, value in enumerate(values))
+        row = self.rows.get(key)
+        if row is None:
+            if self.size == len(self.counts):
+                self.codes = np.concatenate([self.codes, np.zeros_like(self.codes)])
+                self.counts = np.concatenate([self.counts, np.zeros_like(self.counts)])
+            row = self.rows[key] = self.size
+            self.codes[row] = key
+            self.size += 1
+        self.counts[row] += count
+
+    # A snapshot (column -> Counter, as aggregates returns) of the responses
+    # matching every {column: value} in `filters`.
+    def snapshot(self, filters=None):
+        import numpy as np
+
+        codes = self.codes[: self.size]
+        counts = self.counts[: self.size]
+        mask = np.ones(self.size, dtype=bool)
+        for column, value in (filters or {}).items():
+            i = DIMENSIONS.index(column)
+            code = self.codes_of[i].get(value)
+            if code is None:
+                mask[:] = False
+                break
+            mask &= codes[:, i] == code
+
+        matched = counts[mask]
+        result = {}
+        for i, column in enumerate(DIMENSIONS):
+            totals = np.bincount(
+                codes[mask, i], weights=matched, minlength=len(self.values[i])
+            )
+            result[column] = Counter({
+                self.values[i][code]: int(total)
+                for code, total in enumerate(totals)
+                if total
+            })
+        return result
+
+
+_lock = threading.Lock()
+# event key -> [cube, loaded at, version]
+_cubes = {}
+# event key -> batches added, to spot a reload that one overtook (see
+# aggregates.rebuild_counters).
+_changes = {}
+
+
+def _new_version():
+    return shared_cache.incr("cube-version")
+
+
+def load_cube(engine, event):
+    with engine.connect() as conn:
+        rows = conn.execute(SNAPSHOT_QUERY, {"event": event}).fetchall()
+    return Cube(rows)
+
+
+def rebuild_cube(engine, event):
+    for _ in range(RELOAD_ATTEMPTS):
+        changes = _changes.get(event, 0)
+        cube = load_cube(engine, event)
+        with _lock:
+            if _changes.get(event, 0) == changes:
+                _cubes[event] = [cube, time.monotonic(), _new_version()]
+                return
+
+    # Submissions kept overtaking the reload. Keep the cube they were added
+    # to, or if there is none, use this load and try again on next use.
+    with _lock:
+        if event in _cubes:
+            _cubes[event][1] = time.monotonic()
+        else:
+            _cubes[event] = [cube, float("-inf"), _new_version()]
+
+
+def _refresh_if_due(engine, event):
+    entry = _cubes.get(event)
+    if entry is None or time.monotonic() - entry[1] > REFRESH_INTERVAL:
+        rebuild_cube(engine, event)
+
+
+# Returns (version, snapshot) for the event's responses matching `filters`.
+# The version changes whenever the cube does, for caching what is built
+# from it.
+def filtered_counts(engine, event, filters=None):
+    _refresh_if_due(engine, event)
+    with _lock:
+        cube, _, version = _cubes[event]
+        return version, cube.snapshot(filters)
+
+
+# row is a dict of column name -> value, as inserted into responses.
+def record_submission(row):
+    with _lock:
+        event = row.get("Event")
+        _changes[event] = _changes.get(event, 0) + 1
+        entry = _cubes.get(event)
+        if entry is None:
+            return
+        entry[0].add([row[column] for column in DIMENSIONS])
+        entry[2] = _new_version()
@@ -0,0 +1,109 @@
+# The SQLAlchemy engine and its connection pool. Everything is set from the
+# environment:
+#   DB_POOL_SIZE, DB_MAX_OVERFLOW  connections kept open / extra under load
+#   DB_POOL_TIMEOUT                seconds to wait for a free connection
+#   DB_POOL_RECYCLE                seconds before a connection is replaced
+#   DB_POOL_PRE_PING               check connections before handing them out
+#   DB_EXTERNAL_POOLER             true when pgbouncer or similar sits in front
+#                                  of the database; the app then keeps no pool
+# pool_status() reports what the pool is doing, including how long callers
+# waited for a connection, so exhaustion shows up under load.
+import os
+import threading
+import time
+
+from sqlalchemy import create_engine, event, exc
+from sqlalchemy.pool import NullPool, QueuePool
+
+DATABASE_URL = os.getenv("DATABASE_URL")
+POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))
+POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+EXTERNAL_POOLER = os.getenv("DB_EXTERNAL_POOLER", "false").lower() == "true"
+
+_stats_lock = threading.Lock()
+_stats = {
+    "checkouts": 0,
+    "checked_out": 0,
+    "timeouts": 0,
+    "wait_seconds_total": 0.0,
+    "wait_seconds_max": 0.0,
+}
+
+
+def _record_wait(seconds, timed_out):
+    with _stats_lock:
+        _stats["checkouts"] += 1
+        _stats["timeouts"] += timed_out
+        _stats["wait_seconds_total"] += seconds
+        _stats["wait_seconds_max"] = max(_stats["wait_seconds_max"], seconds)
+
+
+# QueuePool has no event for "started waiting", so time the checkout here.
+class TimedQueuePool(QueuePool):
+    def _do_get(self):
+        start = time.perf_counter()
+        timed_out = False
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            timed_out = True
+            raise
+        finally:
+            _record_wait(time.perf_counter() - start, timed_out)
+
+
+def make_engine(url=DATABASE_URL):
+    if EXTERNAL_POOLER:
+        engine = create_engine(url, poolclass=NullPool)
+    elif url.startswith("sqlite") and (":memory:" in url or url == "sqlite://"):
+        engine = create_engine(url)
+    else:
+        engine = create_engine(
+            url,
+            poolclass=TimedQueuePool,
+            pool_size=POOL_SIZE,
+            max_overflow=MAX_OVERFLOW,
+            pool_timeout=POOL_TIMEOUT,
+            pool_recycle=POOL_RECYCLE,
+            pool_pre_ping=POOL_PRE_PING,
+        )
+
+    @event.listens_for(engine, "checkout")
+    def on_checkout(dbapi_conn, record, proxy):
+        with _stats_lock:
+            _stats["checked_out"] += 1
+
+    @event.listens_for(engine, "checkin")
+    def on_checkin(dbapi_conn, record):
+        with _stats_lock:
+            _stats["checked_out"] -= 1
+
+    return engine
+
+
+engine = make_engine()
+
+# A forked process (a gunicorn worker of a preloaded app, a background chart
+# job) must not use the parent's pooled connections; it opens its own.
+# close=False leaves the parent's connections alone.
+os.register_at_fork(after_in_child=lambda: engine.dispose(close=False))
+
+
+def pool_status():
+    pool = engine.pool
+    with _stats_lock:
+        status = dict(_stats)
+    status["pool"] = type(pool).__name__
+    if isinstance(pool, QueuePool):
+        status["size"] = pool.size()
+        status["max_overflow"] = MAX_OVERFLOW
+        status["overflow"] = pool.overflow()
+        status["idle"] = pool.checkedin()
+    if status["checkouts"]:
+        status["wait_seconds_mean"] = (
+            status["wait_seconds_total"] / status["checkouts"]
+        )
+    return status
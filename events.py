@@ -0,0 +1,236 @@
+# Events (an Easter service, a campaign) that responses are grouped under.
+# Every response is stored with the key of the event it was given at, and
+# the charts, the data view and the CSV export show one event at a time:
+# the current one, or another picked with ?event=<key> in the URL.
+#
+# The current event is EVENT_KEY if that is set, otherwise the most
+# recently started one in the events table. Starting a new event (the
+# admin button, or `python events.py start`) is a single insert; earlier
+# responses stay in the database under their own key. Each process caches
+# the list of events for EVENT_REFRESH_SECONDS, so other workers switch to
+# a newly started event within that time.
+#
+# Events given the same name (every year's "Easter") are shown together on
+# the "Over time" chart, one line per year.
+#
+#   python events.py list                          events, newest first
+#   python events.py start [KEY] [--name NAME] [--at YYYY-MM-DD]
+#                                                  start (or record) an event
+#   python events.py delete KEY                    delete an event's responses
+import argparse
+import os
+import re
+import sys
+import threading
+import time
+from datetime import datetime
+
+from sqlalchemy import Column, DateTime, MetaData, String, Table, select, text
+
+import time_buckets
+
+EVENT_KEY = os.getenv("EVENT_KEY") or None
+REFRESH_INTERVAL = float(os.getenv("EVENT_REFRESH_SECONDS", "30"))
+# Responses stored before events were recorded are given this key, unless
+# EVENT_KEY is set.
+DEFAULT_KEY = "default"
+KEY_PATTERN = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+metadata = MetaData()
+
+events = Table(
+    "events",
+    metadata,
+    Column("key", String(64), primary_key=True),
+    Column("name", String(255)),
+    Column("started_at", DateTime, nullable=False),
+)
+
+
+def is_valid_key(key):
+    return isinstance(key, str) and KEY_PATTERN.match(key) is not None
+
+
+def _exists(conn, key):
+    return conn.execute(
+        select(events.c.key).where(events.c.key == key)
+    ).first() is not None
+
+
+def _insert(conn, key, name=None, started_at=None):
+    conn.execute(
+        events.insert(),
+        {
+            "key": key,
+            "name": name or key,
+            "started_at": started_at or time_buckets.utc_now(),
+        },
+    )
+
+
+# Creates the table and makes sure there is a current event: EVENT_KEY, or
+# DEFAULT_KEY when the table is empty. Returns the current event's key.
+def setup(engine):
+    metadata.create_all(engine)
+    with engine.begin() as conn:
+        if EVENT_KEY and not _exists(conn, EVENT_KEY):
+            _insert(conn, EVENT_KEY)
+        elif conn.execute(select(events.c.key).limit(1)).first() is None:
+            _insert(conn, DEFAULT_KEY, "Before events were recorded")
+    reload(engine)
+    return _current
+
+
+# (key, name, started at) for every event, newest first.
+def list_events(engine):
+    with engine.connect() as conn:
+        return [
+            tuple(row)
+            for row in conn.execute(
+                select(events.c.key, events.c.name, events.c.started_at)
+                .order_by(events.c.started_at.desc(), events.c.key.desc())
+            )
+        ]
+
+
+_lock = threading.Lock()
+_current = None
+_keys = frozenset()
+_names = {}
+_loaded_at = 0.0
+
+
+def reload(engine):
+    global _current, _keys, _names, _loaded_at
+    listed = list_events(engine)
+    keys = [key for key, _, _ in listed]
+    with _lock:
+        _keys = frozenset(keys)
+        _names = {key: name for key, name, _ in listed}
+        _current = EVENT_KEY or (keys[0] if keys else DEFAULT_KEY)
+        _loaded_at = time.monotonic()
+
+
+def _refresh_if_due(engine):
+    if _current is None or time.monotonic() - _loaded_at > REFRESH_INTERVAL:
+        reload(engine)
+
+
+def current_event(engine):
+    _refresh_if_due(engine)
+    return _current
+
+
+# The event a request is for: `key` (from the URL) if it names a known
+# event, otherwise the current one.
+def resolve(engine, key=None):
+    _refresh_if_due(engine)
+    if key and key in _keys:
+        return key
+    return _current
+
+
+# resolve() from what this process last loaded, without going to the
+# database.
+def resolve_cached(key=None):
+    if key and key in _keys:
+        return key
+    return _current
+
+
+def exists(engine, key):
+    _refresh_if_due(engine)
+    return key in _keys
+
+
+# The keys of the events named like `key`, itself included, oldest first.
+def same_name(engine, key):
+    _refresh_if_due(engine)
+    names = _names
+    name = names.get(key, key)
+    return [k for k, n in reversed(names.items()) if n == name] or [key]
+
+
+# A key for an event started today: event-2026-04-05, then -2, -3 ...
+def _new_key(conn):
+    base = f"event-{time_buckets.utc_now().date().isoformat()}"
+    key = base
+    n = 1
+    while _exists(conn, key):
+        n += 1
+        key = f"{base}-{n}"
+    return key
+
+
+# Records a new event and returns its key. Started now, it becomes the
+# current event (unless EVENT_KEY pins one); an earlier started_at records
+# a past event, e.g. to import its responses.
+def start_event(engine, key=None, name=None, started_at=None):
+    if key is not None and not is_valid_key(key):
+        raise ValueError(
+            f"Event key {key!r} must be 1-64 letters, digits, '-' or '_'"
+        )
+    with engine.begin() as conn:
+        if key is None:
+            key = _new_key(conn)
+        elif _exists(conn, key):
+            raise ValueError(f"Event {key!r} already exists")
+        _insert(conn, key, name, started_at)
+    reload(engine)
+    return key
+
+
+# Deletes an event with its responses and arrival counts. Running apps
+# drop the event's counts on their next refresh.
+def delete_event(engine, key):
+    with engine.begin() as conn:
+        deleted = conn.execute(
+            text('DELETE FROM responses WHERE "Event" = :key'), {"key": key}
+        ).rowcount
+        time_buckets.clear(conn, key)
+        conn.execute(events.delete().where(events.c.key == key))
+    reload(engine)
+    return deleted
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Manage events.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("list")
+    start = commands.add_parser("start")
+    start.add_argument("key", nargs="?")
+    start.add_argument("--name")
+    start.add_argument(
+        "--at", type=datetime.fromisoformat, help="when it started, in UTC"
+    )
+    delete = commands.add_parser("delete")
+    delete.add_argument("key")
+    args = parser.parse_args(argv)
+
+    from db import engine
+    from schema import ensure_schema
+
+    ensure_schema(engine)
+    if args.command == "list":
+        current = current_event(engine)
+        for key, name, started_at in list_events(engine):
+            marker = "*" if key == current else " "
+            print(f"{marker} {key:<24} {started_at:%Y-%m-%d %H:%M}  {name}")
+    elif args.command == "start":
+        try:
+            key = start_event(engine, args.key, args.name, args.at)
+        except ValueError as e:
+            print(e)
+            return 1
+        print(f"Started event {key}; current event is {current_event(engine)}.")
+    elif args.command == "delete":
+        if not exists(engine, args.key):
+            print(f"No event {args.key!r}")
+            return 1
+        deleted = delete_event(engine, args.key)
+        print(f"Deleted event {args.key} and its {deleted} responses.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,69 @@
+# Rendered charts, kept so repeat views skip the counts and the Plotly
+# figure build. Entries are keyed by (chart type, data version); the
+# version changes on every insert or delete, so stale entries are never
+# returned and simply age out. Holds at most FIGURE_CACHE_SIZE entries,
+# evicting the least recently used.
+#
+# With a shared CACHE_BACKEND the charts are kept there instead, for
+# FIGURE_CACHE_SECONDS each, so a chart built by one worker process is
+# served by all of them.
+import os
+import threading
+from collections import OrderedDict
+
+import shared_cache
+
+MAX_ENTRIES = int(os.getenv("FIGURE_CACHE_SIZE", "32"))
+SHARED_TTL = float(os.getenv("FIGURE_CACHE_SECONDS", "600"))
+
+_lock = threading.Lock()
+_entries = OrderedDict()
+
+
+def _shared_key(key):
+    return f"figure:{key!r}"
+
+
+def get(key):
+    if shared_cache.SHARED:
+        return shared_cache.get(_shared_key(key))
+    with _lock:
+        value = _entries.get(key)
+        if value is not None:
+            _entries.move_to_end(key)
+        return value
+
+
+def put(key, value):
+    if shared_cache.SHARED:
+        shared_cache.set(_shared_key(key), value, expire=SHARED_TTL)
+        return
+    with _lock:
+        _entries[key] = value
+        _entries.move_to_end(key)
+        while len(_entries) > MAX_ENTRIES:
+            _entries.popitem(last=False)
+
+
+def clear():
+    with _lock:
+        _entries.clear()
+
+
+# The entry for key, building and storing it with build() if there is none.
+# With a shared backend one worker builds it while any others asking for
+# the same key wait for the result, rather than all building it at once.
+def get_or_build(key, build):
+    value = get(key)
+    if value is not None:
+        return value
+    if not shared_cache.SHARED:
+        value = build()
+        put(key, value)
+        return value
+    with shared_cache.lock(_shared_key(key)):
+        value = get(key)
+        if value is None:
+            value = build()
+            put(key, value)
+    return value
@@ -0,0 +1,215 @@
+# Country data for the form. The country list and the country -> state
+# index ship with the repo in data/ and are loaded once when the app starts,
+# so the form never waits on the network. Set COUNTRY_REFRESH_INTERVAL
+# (seconds) to also refresh the countries from restcountries.com in a
+# background thread (one call per interval across all the workers sharing a
+# CACHE_BACKEND), and run `python geo.py --rebuild` to regenerate the
+# state index from countriesnow.space.
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from types import MappingProxyType
+
+import http_client
+import shared_cache
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+COUNTRIES_PATH = os.path.join(DATA_DIR, "countries.json")
+SUBDIVISIONS_PATH = os.path.join(DATA_DIR, "subdivisions.json")
+COUNTRIES_URL = "https://restcountries.com/v3.1/all?fields=name"
+STATES_URL = "https://countriesnow.space/api/v0.1/countries/states"
+
+FALLBACK_COUNTRIES = ["United States", "Canada", "United Kingdom", "Other"]
+
+logger = logging.getLogger(__name__)
+
+
+# United States goes first since most of our visitors are from here.
+def order_countries(names):
+    countries = sorted(set(names))
+    if "United States" in countries:
+        countries.remove("United States")
+    countries.insert(0, "United States")
+    return tuple(countries)
+
+
+def load_countries(path=COUNTRIES_PATH):
+    try:
+        with open(path, encoding="utf-8") as f:
+            return order_countries(json.load(f))
+    except (OSError, ValueError) as e:
+        logger.error("Failed to load bundled countries: %s", e)
+        return tuple(FALLBACK_COUNTRIES)
+
+
+COUNTRIES = load_countries()
+
+
+def get_country_list():
+    return COUNTRIES
+
+
+# Fetches the live list. Only swaps it in if the request worked, so a bad
+# response never replaces the bundled data. Always asks (ttl=0); the
+# client's cache only stands in while restcountries.com is failing.
+def refresh_countries():
+    global COUNTRIES
+    try:
+        names = [
+            c["name"]["common"]
+            for c in http_client.get_json(COUNTRIES_URL, ttl=0)
+        ]
+    except Exception as e:
+        logger.warning("Failed to refresh countries: %s", e)
+        return False
+    if names:
+        COUNTRIES = order_countries(names)
+    return bool(names)
+
+
+# Refreshes the countries if no worker has in the last `interval` seconds,
+# sharing the result; otherwise takes the list the last refresh stored.
+def sync_countries(interval):
+    global COUNTRIES
+    with shared_cache.lock("countries"):
+        entry = shared_cache.get("countries")
+        if entry is None or time.time() - entry[0] >= interval:
+            refresh_countries()
+            shared_cache.set("countries", (time.time(), COUNTRIES))
+            return
+    # Swapped only on a change, so the form layout built from the list is
+    # only rebuilt then.
+    if entry[1] != COUNTRIES:
+        COUNTRIES = entry[1]
+
+
+_refresh_lock = threading.Lock()
+_refresh_pid = None
+
+
+# Starts the refresh thread, once per process. Threads don't survive a
+# fork, so a forked worker calls this again (the app does on its first
+# request).
+def start_background_refresh(interval):
+    global _refresh_pid
+    with _refresh_lock:
+        if _refresh_pid == os.getpid():
+            return None
+        _refresh_pid = os.getpid()
+
+    def run():
+        while True:
+            sync_countries(interval)
+            time.sleep(interval)
+
+    thread = threading.Thread(target=run, name="country-refresh", daemon=True)
+    thread.start()
+    return thread
+
+
+# Country -> dropdown options for its states/provinces, built once. The
+# mapping is read-only and the options are tuples, so callbacks can hand
+# them straight to the dropdown without copying.
+def load_state_options(path=SUBDIVISIONS_PATH):
+    try:
+        with open(path, encoding="utf-8") as f:
+            subdivisions = json.load(f)
+    except (OSError, ValueError) as e:
+        logger.error("Failed to load bundled states: %s", e)
+        subdivisions = {}
+    return MappingProxyType(
+        {
+            country: tuple({"label": s, "value": s} for s in states)
+            for country, states in subdivisions.items()
+        }
+    )
+
+
+STATE_OPTIONS = load_state_options()
+
+
+def get_state_options(country):
+    return STATE_OPTIONS.get(country, ())
+
+
+# US state name -> USPS code, for the choropleth. Keys are normalized with
+# state_key(), so lookups ignore case, spacing and periods, and codes and a
+# few common alternate names resolve too.
+US_STATE_CODES = {
+    "Alabama": "AL", "Alaska": "AK", "Arizona": "AZ", "Arkansas": "AR",
+    "California": "CA", "Colorado": "CO", "Connecticut": "CT", "Delaware": "DE",
+    "District of Columbia": "DC", "Florida": "FL", "Georgia": "GA", "Hawaii": "HI",
+    "Idaho": "ID", "Illinois": "IL", "Indiana": "IN", "Iowa": "IA", "Kansas": "KS",
+    "Kentucky": "KY", "Louisiana": "LA", "Maine": "ME", "Maryland": "MD",
+    "Massachusetts": "MA", "Michigan": "MI", "Minnesota": "MN", "Mississippi": "MS",
+    "Missouri": "MO", "Montana": "MT", "Nebraska": "NE", "Nevada": "NV",
+    "New Hampshire": "NH", "New Jersey": "NJ", "New Mexico": "NM", "New York": "NY",
+    "North Carolina": "NC", "North Dakota": "ND", "Ohio": "OH", "Oklahoma": "OK",
+    "Oregon": "OR", "Pennsylvania": "PA", "Rhode Island": "RI",
+    "South Carolina": "SC", "South Dakota": "SD", "Tennessee": "TN", "Texas": "TX",
+    "Utah": "UT", "Vermont": "VT", "Virginia": "VA", "Washington": "WA",
+    "West Virginia": "WV", "Wisconsin": "WI", "Wyoming": "WY",
+}
+STATE_ALIASES = {
+    "Washington DC": "DC",
+    "Washington D.C.": "DC",
+    "DC": "DC",
+    "Washington State": "WA",
+}
+
+
+def state_key(name):
+    return " ".join(name.replace(".", " ").split()).casefold()
+
+
+STATE_CODE_INDEX = MappingProxyType(
+    {
+        state_key(name): code
+        for name, code in [
+            *US_STATE_CODES.items(),
+            *((code, code) for code in US_STATE_CODES.values()),
+            *STATE_ALIASES.items(),
+        ]
+    }
+)
+
+
+# USPS code -> the state's name as the dropdown spells it.
+US_STATE_NAMES = MappingProxyType({code: name for name, code in US_STATE_CODES.items()})
+
+
+# The USPS code for a US state name, or None for anything else.
+def state_code(name):
+    if not name:
+        return None
+    return STATE_CODE_INDEX.get(state_key(name))
+
+
+# Rebuilds data/subdivisions.json from countriesnow.space. Run by hand when
+# the bundled index needs updating; the app itself never calls this.
+def rebuild_subdivisions(path=SUBDIVISIONS_PATH):
+    data = http_client.get_json(STATES_URL, ttl=0)
+    if data.get("error", True) or "data" not in data:
+        raise ValueError("Invalid response from countriesnow.space")
+
+    subdivisions = {}
+    for country in data["data"]:
+        states = {s["name"] for s in country.get("states", [])}
+        if country["name"] == "United States":
+            states.add("District of Columbia")
+        if states:
+            subdivisions[country["name"]] = sorted(states)
+
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(dict(sorted(subdivisions.items())), f, ensure_ascii=False, indent=0)
+    return len(subdivisions)
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] == ["--rebuild"]:
+        print("Wrote states for", rebuild_subdivisions(), "countries")
+    else:
+        print("Usage: python geo.py --rebuild")
@@ -0,0 +1,17 @@
+# gunicorn settings for wsgi.py; see there for running it. Read from the
+# environment:
+#   PORT          port to listen on (8050)
+#   WEB_WORKERS   worker processes (one per CPU)
+#   WEB_THREADS   threads per worker (4); requests mostly wait on the
+#                 database, so a few threads keep a worker's CPU busy
+#   WEB_TIMEOUT   seconds before a stuck worker is restarted (60)
+#   LAZY_INIT     false preloads the app before forking the workers
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8050')}"
+workers = int(os.getenv("WEB_WORKERS", multiprocessing.cpu_count()))
+threads = int(os.getenv("WEB_THREADS", "4"))
+worker_class = "gthread"
+timeout = int(os.getenv("WEB_TIMEOUT", "60"))
+preload_app = os.getenv("LAZY_INIT", "true").lower() == "false"
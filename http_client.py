@@ -0,0 +1,159 @@
+# Shared client for the HTTP calls the app makes to outside APIs. All of
+# them go through one requests Session per process, which keeps connections
+# alive between calls, and get_json() adds:
+#   - connect and read timeouts on every request
+#   - retries with exponential backoff on connection errors and 429/5xx,
+#     up to HTTP_RETRIES times
+#   - a circuit breaker per host: after HTTP_BREAKER_FAILURES failed calls
+#     in a row the host is skipped for HTTP_BREAKER_RESET seconds, then one
+#     call is let through to see if it has recovered
+#   - a cache of responses that expire after their TTL. While a host is
+#     failing, the last response is returned even if it has expired.
+# Settings come from the environment: HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT,
+# HTTP_RETRIES, HTTP_BACKOFF, HTTP_BREAKER_FAILURES, HTTP_BREAKER_RESET and
+# HTTP_CACHE_TTL (seconds, the default TTL).
+import logging
+import os
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+import metrics
+
+CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "3"))
+READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", "10"))
+RETRIES = int(os.getenv("HTTP_RETRIES", "2"))
+BACKOFF = float(os.getenv("HTTP_BACKOFF", "0.5"))
+BREAKER_FAILURES = int(os.getenv("HTTP_BREAKER_FAILURES", "3"))
+BREAKER_RESET = float(os.getenv("HTTP_BREAKER_RESET", "60"))
+CACHE_TTL = float(os.getenv("HTTP_CACHE_TTL", "3600"))
+POOL_SIZE = 10
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitOpen(Exception):
+    pass
+
+
+class CircuitBreaker:
+    def __init__(self, failures, reset):
+        self.max_failures = failures
+        self.reset = reset
+        self.failures = 0
+        self.opened_at = None
+        self.trial = False
+        self.lock = threading.Lock()
+
+    # Whether a call may go ahead. Once the reset time has passed, lets a
+    # single trial call through.
+    def allow(self):
+        with self.lock:
+            if self.opened_at is None:
+                return True
+            if not self.trial and time.monotonic() - self.opened_at >= self.reset:
+                self.trial = True
+                return True
+            return False
+
+    def succeeded(self):
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial = False
+
+    def failed(self):
+        with self.lock:
+            self.failures += 1
+            if self.trial or self.failures >= self.max_failures:
+                self.opened_at = time.monotonic()
+            self.trial = False
+
+
+_lock = threading.Lock()
+_session = None
+_session_pid = None
+_breakers = {}
+# url -> (expires at, data)
+_cache = {}
+
+
+def make_session():
+    retry = Retry(
+        total=RETRIES,
+        backoff_factor=BACKOFF,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=("GET", "HEAD"),
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(
+        pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE, max_retries=retry
+    )
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.hooks["response"].append(metrics.record_http)
+    return session
+
+
+# The session for this process. A forked worker gets its own, so no
+# connection is shared between processes.
+def get_session():
+    global _session, _session_pid
+    with _lock:
+        if _session is None or _session_pid != os.getpid():
+            _session = make_session()
+            _session_pid = os.getpid()
+        return _session
+
+
+def get_breaker(url):
+    host = urlsplit(url).netloc
+    with _lock:
+        if host not in _breakers:
+            _breakers[host] = CircuitBreaker(BREAKER_FAILURES, BREAKER_RESET)
+        return _breakers[host]
+
+
+# GETs `url` and returns the decoded JSON, from the cache while it is
+# fresh. If the call fails or the host's breaker is open, returns the last
+# cached response however old it is, and raises only when there is none.
+def get_json(url, ttl=CACHE_TTL):
+    now = time.monotonic()
+    cached = _cache.get(url)
+    if cached and cached[0] > now:
+        return cached[1]
+
+    breaker = get_breaker(url)
+    if not breaker.allow():
+        if cached:
+            return cached[1]
+        raise CircuitOpen(f"{urlsplit(url).netloc} is failing; not calling it")
+
+    try:
+        response = get_session().get(
+            url, timeout=(CONNECT_TIMEOUT, READ_TIMEOUT)
+        )
+        response.raise_for_status()
+        data = response.json()
+    except (requests.RequestException, ValueError) as e:
+        breaker.failed()
+        if cached:
+            logger.warning("%s failed, using cached data: %s", url, e)
+            return cached[1]
+        raise
+
+    breaker.succeeded()
+    _cache[url] = (time.monotonic() + ttl, data)
+    return data
+
+
+# Forgets cached responses and breaker state.
+def reset():
+    _cache.clear()
+    with _lock:
+        _breakers.clear()
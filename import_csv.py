@@ -0,0 +1,200 @@
+# Bulk loads past responses from a CSV in the responses.csv format:
+#
+#   python import_csv.py responses.csv [--event KEY] [--chunk-size 5000]
+#                        [--dry-run]
+#
+# Rows are loaded into the current event, or the one named with --event,
+# which must exist already (`python events.py start KEY --at DATE` records
+# a past one).
+# The file is read a chunk at a time, so its size doesn't matter. Each row
+# goes through the same rules as the form (submissions.py): the age range,
+# Local and the state code are worked out again from the age and state, and
+# rows missing a required answer or with one the database would refuse are
+# rejected. Rejected rows are reported by
+# line number and skipped. Everything else is loaded in one transaction,
+# with COPY on PostgreSQL and batched INSERTs elsewhere, so a failed load
+# leaves the table as it was.
+#
+# "Submitted At", if the file has it, is read as UTC unless it carries an
+# offset; rows without it are loaded without a time and left out of the
+# "Over time" chart.
+#
+# A running app picks the new rows up on its next aggregate refresh
+# (AGGREGATE_REFRESH_SECONDS).
+import argparse
+import csv
+import io
+import logging
+import sys
+import time
+
+import events
+import time_buckets
+from schema import ensure_schema, responses
+from submissions import build_row, invalid_values, missing_fields
+
+# Imported rows don't go through the write-behind queue, so they have no
+# submission id.
+COLUMNS = [
+    c.name for c in responses.columns if c.name not in ("id", "Submission ID")
+]
+MAX_REPORTED_ERRORS = 20
+
+
+class InvalidRow(ValueError):
+    pass
+
+
+def _text(record, column):
+    value = (record.get(column) or "").strip()
+    return value or None
+
+
+# Turns one CSV record into a responses row for `event`, or raises
+# InvalidRow.
+def parse_record(record, event=None):
+    age = _text(record, "Age")
+    try:
+        age = int(float(age)) if age is not None else None
+    except ValueError:
+        raise InvalidRow(f"Age {age!r} is not a number")
+
+    submitted_at = _text(record, "Submitted At")
+    if submitted_at is not None:
+        text = submitted_at
+        submitted_at = time_buckets.parse_timestamp(text)
+        if submitted_at is None:
+            raise InvalidRow(f"Submitted At {text!r} is not a date and time")
+
+    row = build_row(
+        _text(record, "Name"),
+        age,
+        _text(record, "Christ Follower"),
+        _text(record, "Faith Decicion"),
+        record.get("How you found us?") or "",
+        _text(record, "Country"),
+        _text(record, "State"),
+        submitted_at,
+        event,
+    )
+
+    missing = missing_fields(row)
+    if missing:
+        raise InvalidRow(f"missing {', '.join(missing)}")
+    invalid = invalid_values(row)
+    if invalid:
+        raise InvalidRow("; ".join(invalid))
+    return row
+
+
+# Yields lists of up to chunk_size valid rows. Errors are appended to
+# `errors` as (line number, message).
+def read_chunks(f, chunk_size, errors, event=None):
+    reader = csv.DictReader(f)
+    missing = [c for c in ("Name", "Age") if c not in (reader.fieldnames or [])]
+    if missing:
+        raise SystemExit(f"CSV has no {', '.join(missing)} column")
+
+    chunk = []
+    for record in reader:
+        try:
+            chunk.append(parse_record(record, event))
+        except InvalidRow as e:
+            errors.append((reader.line_num, str(e)))
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _copy_value(value):
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    return value
+
+
+def copy_chunk(conn, rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow([_copy_value(row[c]) for c in COLUMNS])
+    buffer.seek(0)
+
+    quoted = ", ".join(f'"{c}"' for c in COLUMNS)
+    cursor = conn.connection.dbapi_connection.cursor()
+    try:
+        cursor.copy_expert(
+            f"COPY responses ({quoted}) FROM STDIN "
+            """WITH (FORMAT csv, FORCE_NOT_NULL ("How you found us?"))""",
+            buffer,
+        )
+    finally:
+        cursor.close()
+
+
+# An executemany. SQLAlchemy sends it as multi-row INSERTs on drivers that
+# support them and as one prepared statement on SQLite, which is faster
+# there than building a large VALUES list.
+def insert_chunk(conn, rows):
+    conn.execute(responses.insert(), rows)
+
+
+# Loads the file into `event` (default: the current event) and returns
+# (rows loaded, errors, seconds taken).
+def load(engine, f, chunk_size=1000, dry_run=False, event=None):
+    if event is None:
+        event = events.current_event(engine)
+    write = copy_chunk if engine.dialect.name == "postgresql" else insert_chunk
+    errors = []
+    loaded = 0
+    start = time.perf_counter()
+    with engine.begin() as conn:
+        for chunk in read_chunks(f, chunk_size, errors, event):
+            if not dry_run:
+                write(conn, chunk)
+                time_buckets.add_rows(conn, chunk)
+            loaded += len(chunk)
+    return loaded, errors, time.perf_counter() - start
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load a responses CSV.")
+    parser.add_argument("path")
+    parser.add_argument("--event", help="event key (default: the current event)")
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument(
+        "--dry-run", action="store_true", help="validate only, load nothing"
+    )
+    args = parser.parse_args(argv)
+
+    from db import engine
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    ensure_schema(engine)
+    if args.event is not None and not events.exists(engine, args.event):
+        raise SystemExit(
+            f"No event {args.event!r}; record it with "
+            f"`python events.py start {args.event} --at YYYY-MM-DD`"
+        )
+    with open(args.path, newline="", encoding="utf-8") as f:
+        loaded, errors, seconds = load(
+            engine, f, args.chunk_size, args.dry_run, args.event
+        )
+
+    for line, message in errors[:MAX_REPORTED_ERRORS]:
+        print(f"line {line}: {message}")
+    if len(errors) > MAX_REPORTED_ERRORS:
+        print(f"... and {len(errors) - MAX_REPORTED_ERRORS} more")
+
+    verb = "Validated" if args.dry_run else "Loaded"
+    rate = loaded / seconds if seconds else 0
+    print(
+        f"{verb} {loaded} rows in {seconds:.2f}s ({rate:.0f} rows/s), "
+        f"{len(errors)} rejected."
+    )
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
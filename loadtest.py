@@ -0,0 +1,253 @@
+# Event-day load test. Starts the app on a local port and sends simulated
+# visitors at it over HTTP, each doing what a visitor's browser does:
+#
+#   1. load the layout and the form
+#   2. pick a country, which loads its states
+#   3. submit the form
+#   4. load the dashboard and switch through every chart and the data table
+#
+# then reports p50/p95/p99 latency and throughput per callback.
+#
+#   python loadtest.py [--visitors 200] [--concurrency 20] [--rows 5000]
+#   python loadtest.py --url http://127.0.0.1:8050 [--visitors ...]
+#
+# Runs against DATABASE_URL, or a throwaway SQLite database seeded with
+# --rows responses. The country refresh is pointed at a stub server on
+# localhost, so no outside API is called. The visitors run in this process
+# too, so they compete with the server for the GIL; compare runs with each
+# other rather than against a real deployment. --url sends them at an app
+# that is already running instead, e.g. under gunicorn (see wsgi.py).
+import argparse
+import json
+import logging
+import os
+import random
+import statistics
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+import benchmark
+
+COUNTRIES = ["United States", "United States", "United States", "Canada", "Mexico"]
+
+
+def percentile(samples, fraction):
+    return samples[min(len(samples) - 1, int(len(samples) * fraction))]
+
+
+# Serves the restcountries.com response shape from the bundled list.
+def start_geo_stub():
+    import geo
+
+    body = json.dumps(
+        [{"name": {"common": name}} for name in geo.get_country_list()]
+    ).encode()
+    base, hits, _ = benchmark.start_stub_server({"/all": lambda: (200, body)})
+    geo.COUNTRIES_URL = base + "/all"
+    return hits
+
+
+def start_app(rows):
+    from werkzeug.serving import make_server
+
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    os.environ.setdefault("COUNTRY_REFRESH_INTERVAL", "5")
+    start_geo_stub()
+    app = benchmark.load_app(rows)
+    server = make_server("127.0.0.1", 0, app.server, threaded=True)
+    # The per-request access log would drown out the report.
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return app, f"http://127.0.0.1:{server.server_port}"
+
+
+class Visitor:
+    def __init__(self, base_url, keys, states, samples):
+        self.base_url = base_url
+        self.keys = keys
+        self.states = states
+        self.samples = samples
+        self.session = requests.Session()
+
+    def get(self, name, path):
+        start = time.perf_counter()
+        response = self.session.get(self.base_url + path, timeout=60)
+        self.samples[name].append(time.perf_counter() - start)
+        response.raise_for_status()
+        return response
+
+    def update(self, name, output, inputs, state=(), changed=None):
+        key, outputs = benchmark.find_callback(self.keys, output)
+        start = time.perf_counter()
+        response = self.session.post(
+            self.base_url + "/_dash-update-component",
+            json=benchmark.update_body(key, outputs, inputs, state, changed),
+            timeout=60,
+        )
+        self.samples[name].append(time.perf_counter() - start)
+        if response.status_code not in (200, 204):
+            raise RuntimeError(f"{name}: HTTP {response.status_code}")
+        return response
+
+    def run(self, number, chart_types):
+        self.get("layout", "/_dash-layout")
+        self.update(
+            "render_layout", "page-container.children",
+            [("submission-store", "data", None)],
+        )
+
+        country = random.choice(COUNTRIES)
+        self.update(
+            "show_state_dropdown", "state-dropdown-container.children",
+            [("country-dropdown", "value", country)],
+        )
+        state = random.choice(self.states[country]) if self.states[country] else None
+
+        self.update(
+            "form_submission",
+            ["chart-request.data", "submission-store.data",
+             "form-error.children", "loading-flag.data"],
+            [("submit-button", "n_clicks", 1)],
+            [
+                ("inpu", "value", f"Load test {number}"),
+                ("age-slider", "value", random.randint(10, 80)),
+                ("christian-status", "value", random.choice(["Yes", "No"])),
+                ("faith-decicion", "value", random.choice(["Yes", "No"])),
+                ("how-they-found-us", "value", ""),
+                ("country-dropdown", "value", country),
+                ("state-dropdown", "value", state),
+                ("event-key", "data", None),
+            ],
+        )
+        self.update(
+            "render_layout", "page-container.children",
+            [("submission-store", "data", "true")],
+        )
+
+        for chart_type in chart_types + ["data"]:
+            self.update(
+                f"chart: {chart_type}", "chart-output.children",
+                [("chart-request", "data", chart_type), ("live-refresh", "data", None)],
+                [("event-key", "data", None), []],
+                ["chart-request.data"],
+            )
+        self.update(
+            "update_responses_table",
+            ["responses-table.data", "responses-table.page_count"],
+            [
+                ("responses-table", "page_current", 0),
+                ("responses-table", "page_size", 10),
+                ("responses-table", "sort_by", []),
+                ("responses-table", "filter_query", ""),
+            ],
+            [("event-key", "data", None)],
+        )
+
+
+# The chart types offered by the dashboard's menu, for an app that isn't
+# running in this process.
+def fetch_chart_types(base_url, keys):
+    visitor = Visitor(base_url, keys, {}, defaultdict(list))
+    response = visitor.update(
+        "render_layout", "page-container.children",
+        [("submission-store", "data", "true")],
+    )
+    chart_types = []
+
+    def walk(node):
+        if isinstance(node, dict):
+            node_id = node.get("id")
+            if isinstance(node_id, dict) and node_id.get("type") == "chart-btn":
+                chart_types.append(node_id["value"])
+            for value in node.values():
+                walk(value)
+        elif isinstance(node, list):
+            for value in node:
+                walk(value)
+
+    walk(response.json())
+    return chart_types
+
+
+# Sends `visitors` visitors at the app, `concurrency` at a time. Returns
+# the samples per callback, the seconds taken and the errors.
+def run_visitors(base_url, visitors, concurrency, chart_types=None):
+    import geo
+
+    dependencies = requests.get(base_url + "/_dash-dependencies", timeout=60).json()
+    keys = [dependency["output"] for dependency in dependencies]
+    if chart_types is None:
+        chart_types = fetch_chart_types(base_url, keys)
+    states = {
+        country: [o["value"] for o in geo.get_state_options(country)]
+        for country in set(COUNTRIES)
+    }
+
+    samples = defaultdict(list)
+    errors = []
+
+    def visit(number):
+        try:
+            Visitor(base_url, keys, states, samples).run(number, chart_types)
+        except Exception as e:
+            errors.append(e)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        list(pool.map(visit, range(visitors)))
+    return samples, time.perf_counter() - start, errors
+
+
+def report(samples, elapsed):
+    print(
+        f"{'callback':<28} {'count':>6} {'req/s':>8} "
+        f"{'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}"
+    )
+    total = 0
+    for name, values in samples.items():
+        values = sorted(values)
+        total += len(values)
+        print(
+            f"{name:<28} {len(values):>6} {len(values) / elapsed:>8.1f} "
+            f"{statistics.median(values) * 1000:>8.1f} "
+            f"{percentile(values, 0.95) * 1000:>8.1f} "
+            f"{percentile(values, 0.99) * 1000:>8.1f}"
+        )
+    print(f"{'all requests':<28} {total:>6} {total / elapsed:>8.1f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load test the dashboard.")
+    parser.add_argument("--visitors", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--rows", type=int, default=5000)
+    parser.add_argument("--url", help="test an app already running here")
+    args = parser.parse_args(argv)
+
+    if args.url:
+        base_url, chart_types = args.url.rstrip("/"), None
+        seeded = "running app"
+    else:
+        app, base_url = start_app(args.rows)
+        chart_types = app.CHART_TYPES
+        seeded = f"{args.rows} seeded rows"
+    samples, elapsed, errors = run_visitors(
+        base_url, args.visitors, args.concurrency, chart_types
+    )
+
+    print(
+        f"{args.visitors} visitors, {args.concurrency} at a time, "
+        f"{seeded}, {elapsed:.1f}s"
+    )
+    report(samples, elapsed)
+    if errors:
+        print(f"{len(errors)} visitors failed, first error: {errors[0]!r}")
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,162 @@
+# In-process latency histograms, exposed in the Prometheus text format.
+# Three things are timed:
+#   - every request to the Flask server, and Dash callbacks by their output
+#     (instrument_server)
+#   - every SQL statement the engine runs (instrument_engine)
+#   - outbound HTTP calls made with requests (record_http, a response hook)
+# render() returns everything plus the connection pool gauges for the
+# /metrics route. Histograms are per process, so each worker reports its own.
+import threading
+import time
+from urllib.parse import urlsplit
+
+from flask import g, request
+
+PREFIX = "easterdash"
+# Upper bounds in seconds, as in the Prometheus client's defaults.
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+DASH_UPDATE_PATH = "/_dash-update-component"
+
+_lock = threading.Lock()
+# name -> {"help": str, "series": {label tuple: [bucket counts, sum, count]}}
+_histograms = {}
+
+
+def define(name, help_text):
+    with _lock:
+        _histograms.setdefault(name, {"help": help_text, "series": {}})
+
+
+def observe(name, seconds, **labels):
+    key = tuple(sorted(labels.items()))
+    with _lock:
+        series = _histograms[name]["series"]
+        entry = series.get(key)
+        if entry is None:
+            entry = series[key] = [[0] * len(BUCKETS), 0.0, 0]
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                entry[0][i] += 1
+        entry[1] += seconds
+        entry[2] += 1
+
+
+# Counts and sums per label set, for benchmarks:
+# {label tuple: (count, total seconds)}.
+def totals(name):
+    with _lock:
+        return {
+            key: (entry[2], entry[1])
+            for key, entry in _histograms[name]["series"].items()
+        }
+
+
+define(
+    "http_request_duration_seconds",
+    "Time to handle a request to the server, by route",
+)
+define("callback_duration_seconds", "Time to run a Dash callback request")
+define("sql_duration_seconds", "Time to run a SQL statement, by its first keyword")
+define(
+    "outbound_http_duration_seconds",
+    "Time until response headers for HTTP calls the app makes",
+)
+
+
+def instrument_server(server):
+    @server.before_request
+    def start_timer():
+        g.metrics_start = time.perf_counter()
+
+    @server.after_request
+    def record_request(response):
+        start = g.pop("metrics_start", None)
+        if start is None:
+            return response
+        seconds = time.perf_counter() - start
+        route = request.url_rule.rule if request.url_rule else "unmatched"
+        observe(
+            "http_request_duration_seconds",
+            seconds,
+            method=request.method,
+            route=route,
+            status=str(response.status_code),
+        )
+        if request.path.endswith(DASH_UPDATE_PATH):
+            body = request.get_json(silent=True) or {}
+            observe(
+                "callback_duration_seconds",
+                seconds,
+                callback=body.get("output", "unknown"),
+            )
+        return response
+
+
+def instrument_engine(engine):
+    from sqlalchemy import event
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("metrics_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after(conn, cursor, statement, parameters, context, executemany):
+        starts = conn.info.get("metrics_start")
+        if not starts:
+            return
+        seconds = time.perf_counter() - starts.pop()
+        words = statement.split(None, 1)
+        observe(
+            "sql_duration_seconds",
+            seconds,
+            operation=words[0].upper() if words else "",
+        )
+
+    @event.listens_for(engine, "handle_error")
+    def failed(context):
+        conn = context.connection
+        if conn is not None and conn.info.get("metrics_start"):
+            conn.info["metrics_start"].pop()
+
+
+# A requests response hook: requests.get(url, hooks={"response": record_http}).
+def record_http(response, *args, **kwargs):
+    observe(
+        "outbound_http_duration_seconds",
+        response.elapsed.total_seconds(),
+        host=urlsplit(response.url).hostname or "",
+        status=str(response.status_code),
+    )
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(pairs):
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+# The Prometheus text exposition of every histogram, plus any gauges given
+# as {name: (help, value)}.
+def render(gauges=None):
+    lines = []
+    with _lock:
+        for name, histogram in sorted(_histograms.items()):
+            full = f"{PREFIX}_{name}"
+            lines.append(f"# HELP {full} {histogram['help']}")
+            lines.append(f"# TYPE {full} histogram")
+            for key, (buckets, total, count) in sorted(histogram["series"].items()):
+                for bound, n in zip(BUCKETS, buckets):
+                    lines.append(f"{full}_bucket{_labels(key + (('le', bound),))} {n}")
+                lines.append(f"{full}_bucket{_labels(key + (('le', '+Inf'),))} {count}")
+                lines.append(f"{full}_sum{_labels(key)} {total}")
+                lines.append(f"{full}_count{_labels(key)} {count}")
+    for name, (help_text, value) in sorted((gauges or {}).items()):
+        full = f"{PREFIX}_{name}"
+        lines.append(f"# HELP {full} {help_text}")
+        lines.append(f"# TYPE {full} gauge")
+        lines.append(f"{full} {value}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,240 @@
+# The responses table and the schema changes the app relies on, applied at
+# startup. Each step checks what is already there, so running it again is
+# harmless. Run it by hand with `python schema.py`.
+#
+# Column names are the ones the app has always used, quoted, so queries and
+# the CSV export don't change. Answers that come from a fixed list are
+# stored as enums (a VARCHAR with a CHECK constraint, so they work the same
+# on every database), age as an integer and "Local" as a boolean.
+import logging
+
+from sqlalchemy import (
+    Boolean,
+    Column,
+    DateTime,
+    Enum,
+    Index,
+    Integer,
+    MetaData,
+    SmallInteger,
+    String,
+    Table,
+    Text,
+    inspect,
+    text,
+)
+
+import events
+import summary_table
+import time_buckets
+from aggregates import DIMENSIONS, USE_SUMMARY_TABLE
+from geo import state_code
+
+AGE_RANGES = ["<18", "18-25", "25-40", ">40"]
+YES_NO = ["Yes", "No"]
+MIGRATE_CHUNK_ROWS = 1000
+
+logger = logging.getLogger(__name__)
+
+metadata = MetaData()
+
+responses = Table(
+    "responses",
+    metadata,
+    Column("id", Integer, primary_key=True),
+    Column("Name", String(255)),
+    Column(
+        "Age Range",
+        Enum(*AGE_RANGES, name="age_range", native_enum=False, create_constraint=True),
+    ),
+    Column("Age", SmallInteger),
+    Column("Local", Boolean),
+    Column("Country", String(100)),
+    Column("State", String(100)),
+    Column("State Code", String(2)),
+    Column(
+        "Christ Follower",
+        Enum(*YES_NO, name="christ_follower", native_enum=False, create_constraint=True),
+    ),
+    Column(
+        "Faith Decicion",
+        Enum(*YES_NO, name="faith_decicion", native_enum=False, create_constraint=True),
+    ),
+    Column("How you found us?", Text),
+    # When the response was saved, in UTC. Empty for rows from before it
+    # was recorded.
+    Column("Submitted At", DateTime),
+    # The key of the event it was given at (see events.py).
+    Column("Event", String(64)),
+    # Set by the write-behind queue (write_queue.py) so a batch replayed
+    # after a crash isn't inserted twice. Empty for rows saved otherwise.
+    Column("Submission ID", String(36)),
+    # Every query the app makes is for one event. Leading with it keeps the
+    # current event's queries as fast as history grows, and the chart
+    # snapshot is answered from the index alone without reading the table.
+    Index("ix_responses_event_dimensions", "Event", *DIMENSIONS),
+    Index("ux_responses_submission_id", "Submission ID", unique=True),
+)
+
+# Indexes replaced by ones above.
+OLD_INDEXES = ["ix_responses_dimensions"]
+
+
+# Tables created before this schema have no id column. They were created
+# by hand, with every column as text or whatever the first insert implied.
+def is_legacy(engine):
+    existing = {c["name"] for c in inspect(engine).get_columns("responses")}
+    return "id" not in existing
+
+
+def _as_int(value):
+    try:
+        return int(float(value))
+    except (TypeError, ValueError):
+        return None
+
+
+def _as_bool(value):
+    if value is None or isinstance(value, bool):
+        return value
+    value = str(value).strip().lower()
+    if value in ("true", "t", "1", "yes"):
+        return True
+    if value in ("false", "f", "0", "no"):
+        return False
+    return None
+
+
+def _as_choice(value, choices):
+    value = None if value is None else str(value).strip()
+    return value if value in choices else None
+
+
+# Converts one row of the old table, which belongs to `event`. Values that
+# don't fit the new types become NULL; the second value returned counts
+# them.
+def convert_row(old, event):
+    row = {
+        "Name": old.get("Name"),
+        "Age Range": _as_choice(old.get("Age Range"), AGE_RANGES),
+        "Age": _as_int(old.get("Age")),
+        "Local": _as_bool(old.get("Local")),
+        "Country": old.get("Country"),
+        "State": old.get("State"),
+        "State Code": old.get("State Code"),
+        "Christ Follower": _as_choice(old.get("Christ Follower"), YES_NO),
+        "Faith Decicion": _as_choice(old.get("Faith Decicion"), YES_NO),
+        "How you found us?": old.get("How you found us?"),
+        "Submitted At": time_buckets.parse_timestamp(old.get("Submitted At")),
+        "Event": old.get("Event") or event,
+    }
+    if row["State Code"] is None and row["Country"] == "United States":
+        row["State Code"] = state_code(row["State"])
+    dropped = sum(
+        1
+        for column in ("Age Range", "Age", "Local", "Christ Follower", "Faith Decicion")
+        if row[column] is None and old.get(column) not in (None, "")
+    )
+    return row, dropped
+
+
+# Moves an old responses table to the typed layout in one transaction: the
+# old table is renamed, the new one created and the rows copied across in
+# chunks. Returns (rows copied, values dropped).
+def migrate_responses(engine, event):
+    copied = dropped = 0
+    with engine.begin() as conn:
+        conn.execute(text("ALTER TABLE responses RENAME TO responses_legacy"))
+        responses.create(conn)
+        result = conn.execute(text("SELECT * FROM responses_legacy"))
+        while True:
+            chunk = result.mappings().fetchmany(MIGRATE_CHUNK_ROWS)
+            if not chunk:
+                break
+            rows = []
+            for old in chunk:
+                row, bad = convert_row(old, event)
+                rows.append(row)
+                dropped += bad
+            conn.execute(responses.insert(), rows)
+            copied += len(rows)
+        conn.execute(text("DROP TABLE responses_legacy"))
+    return copied, dropped
+
+
+def add_submitted_at_column(engine):
+    existing = {c["name"] for c in inspect(engine).get_columns("responses")}
+    if "Submitted At" not in existing:
+        with engine.begin() as conn:
+            conn.execute(text('ALTER TABLE responses ADD COLUMN "Submitted At" TIMESTAMP'))
+
+
+# Rows from before events were recorded belong to `event`.
+def add_event_column(engine, event):
+    existing = {c["name"] for c in inspect(engine).get_columns("responses")}
+    if "Event" not in existing:
+        with engine.begin() as conn:
+            conn.execute(text('ALTER TABLE responses ADD COLUMN "Event" VARCHAR(64)'))
+            conn.execute(
+                text('UPDATE responses SET "Event" = :event WHERE "Event" IS NULL'),
+                {"event": event},
+            )
+
+
+def add_submission_id_column(engine):
+    existing = {c["name"] for c in inspect(engine).get_columns("responses")}
+    if "Submission ID" not in existing:
+        with engine.begin() as conn:
+            conn.execute(
+                text('ALTER TABLE responses ADD COLUMN "Submission ID" VARCHAR(36)')
+            )
+
+
+def drop_old_indexes(engine):
+    existing = {i["name"] for i in inspect(engine).get_indexes("responses")}
+    with engine.begin() as conn:
+        for name in OLD_INDEXES:
+            if name in existing:
+                conn.execute(text(f"DROP INDEX {name}"))
+
+
+# Existing rows without an event are given `event`. Returns True if
+# existing rows were migrated.
+def ensure_responses(engine, event):
+    if not inspect(engine).has_table("responses"):
+        metadata.create_all(engine)
+        return False
+    if is_legacy(engine):
+        copied, dropped = migrate_responses(engine, event)
+        logger.info(
+            "Migrated %d responses to the typed schema; "
+            "%d values did not fit and were stored as NULL.",
+            copied,
+            dropped,
+        )
+        return True
+    # Columns and indexes added since the table was created.
+    add_submitted_at_column(engine)
+    add_event_column(engine, event)
+    add_submission_id_column(engine)
+    drop_old_indexes(engine)
+    for index in responses.indexes:
+        index.create(engine, checkfirst=True)
+    return False
+
+
+def ensure_schema(engine):
+    migrated = ensure_responses(engine, events.setup(engine))
+    time_buckets.setup(engine)
+    if USE_SUMMARY_TABLE:
+        summary_table.setup(engine)
+        if migrated:
+            summary_table.backfill(engine)
+
+
+if __name__ == "__main__":
+    from db import engine
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    ensure_schema(engine)
+    print("Schema is up to date.")
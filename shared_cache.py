@@ -0,0 +1,161 @@
+# Cache shared by the app's worker processes, for what is worth working out
+# once per deployment rather than once per process: the chart counts
+# (aggregates.py), rendered charts (figure_cache.py) and the refreshed
+# country list (geo.py). CACHE_BACKEND picks where it lives:
+#
+#   memory      this process only (the default; a single process needs no
+#               more)
+#   filesystem  a diskcache directory, CACHE_DIR, shared by every process on
+#               the machine. Also the local stand-in for redis.
+#   redis       the server at REDIS_URL, shared across machines. Needs the
+#               redis package.
+#
+# Values are pickled by the shared backends, so what get() returns is the
+# caller's own copy; the memory backend hands back the stored object itself,
+# so callers never change a value after set() or get(). lock(name) holds
+# across processes too, for read-modify-write and for making one worker do
+# a computation while the others wait for its result.
+import os
+import pickle
+import threading
+
+BACKEND = os.getenv("CACHE_BACKEND", "memory").lower()
+CACHE_DIR = os.getenv("CACHE_DIR", "./cache/shared")
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+# A lock held longer than this (a crashed worker) is released.
+LOCK_TIMEOUT = float(os.getenv("CACHE_LOCK_SECONDS", "60"))
+PREFIX = "easterdash:"
+
+SHARED = BACKEND != "memory"
+
+
+class MemoryCache:
+    def __init__(self):
+        self.mutex = threading.Lock()
+        self.entries = {}
+        self.locks = {}
+
+    def get(self, key, default=None):
+        return self.entries.get(key, default)
+
+    def set(self, key, value, expire=None):
+        self.entries[key] = value
+
+    def delete(self, key):
+        self.entries.pop(key, None)
+
+    def incr(self, key):
+        with self.mutex:
+            value = self.entries[key] = self.entries.get(key, 0) + 1
+            return value
+
+    def lock(self, name):
+        with self.mutex:
+            return self.locks.setdefault(name, threading.RLock())
+
+
+class FilesystemCache:
+    def __init__(self, directory):
+        import diskcache
+
+        self.cache = diskcache.Cache(directory)
+
+    def get(self, key, default=None):
+        return self.cache.get(key, default)
+
+    def set(self, key, value, expire=None):
+        self.cache.set(key, value, expire=expire)
+
+    def delete(self, key):
+        self.cache.delete(key)
+
+    def incr(self, key):
+        return self.cache.incr(key)
+
+    def lock(self, name):
+        import diskcache
+
+        return diskcache.RLock(self.cache, f"lock:{name}", expire=LOCK_TIMEOUT)
+
+
+class RedisCache:
+    def __init__(self, url):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError(
+                "CACHE_BACKEND=redis needs the redis package (pip install redis)"
+            )
+        self.client = redis.Redis.from_url(url)
+
+    def get(self, key, default=None):
+        value = self.client.get(PREFIX + key)
+        return default if value is None else pickle.loads(value)
+
+    def set(self, key, value, expire=None):
+        self.client.set(
+            PREFIX + key,
+            pickle.dumps(value),
+            ex=max(1, int(expire)) if expire else None,
+        )
+
+    def delete(self, key):
+        self.client.delete(PREFIX + key)
+
+    def incr(self, key):
+        return self.client.incr(PREFIX + key)
+
+    def lock(self, name):
+        return self.client.lock(PREFIX + f"lock:{name}", timeout=LOCK_TIMEOUT)
+
+
+def make_backend():
+    if BACKEND == "memory":
+        return MemoryCache()
+    if BACKEND == "filesystem":
+        return FilesystemCache(CACHE_DIR)
+    if BACKEND == "redis":
+        return RedisCache(REDIS_URL)
+    raise ValueError(
+        f"CACHE_BACKEND must be memory, filesystem or redis, not {BACKEND!r}"
+    )
+
+
+_lock = threading.Lock()
+_backend = None
+_backend_pid = None
+
+
+# The backend for this process. A forked worker opens its own, so no
+# database file handle or socket is shared between processes.
+def get_backend():
+    global _backend, _backend_pid
+    with _lock:
+        if _backend is None or (SHARED and _backend_pid != os.getpid()):
+            _backend = make_backend()
+            _backend_pid = os.getpid()
+        return _backend
+
+
+def get(key, default=None):
+    return get_backend().get(key, default)
+
+
+# expire is in seconds; None keeps the value until it is replaced. The
+# memory backend keeps everything until it is replaced.
+def set(key, value, expire=None):
+    get_backend().set(key, value, expire)
+
+
+def delete(key):
+    get_backend().delete(key)
+
+
+# Adds one to the integer at key (0 if unset) and returns the result.
+def incr(key):
+    return get_backend().incr(key)
+
+
+# A lock named `name`, for `with shared_cache.lock(name):`.
+def lock(name):
+    return get_backend().lock(name)
@@ -0,0 +1,93 @@
+# The rules for one submission, shared by the form callback and the CSV
+# import: the values worked out from the answers (age range, whether the
+# visitor is local, the state code), which answers are required and what
+# the database accepts.
+from sqlalchemy import Enum, String
+
+from geo import US_STATE_NAMES, state_code
+from schema import YES_NO, responses
+
+# Checked on the built row. The form slider always gives an age, so the
+# age range is only missing when the age was.
+REQUIRED_FIELDS = ["Name", "Age Range", "Christ Follower", "Faith Decicion"]
+
+# The slider gives 10-80; imported ages outside this are mistakes.
+MIN_AGE = 0
+MAX_AGE = 120
+
+# Text columns with a length limit -> the limit, from the schema.
+MAX_LENGTHS = {
+    column.name: column.type.length
+    for column in responses.columns
+    if isinstance(column.type, String)
+    and not isinstance(column.type, Enum)
+    and column.type.length
+}
+
+
+# Simple function to take any given age and bin it so we can created age groups.
+def bin_age(age):
+    if age < 18:
+        return "<18"
+    elif 18 <= age <= 25:
+        return "18-25"
+    elif 26 <= age <= 40:
+        return "25-40"
+    else:
+        return ">40"
+
+
+# Check if Local
+def checkLocal(state_):
+    return state_ == "District of Columbia"
+
+
+# A responses row from the answers. US states are stored under the name
+# the dropdown uses, whatever spelling came in, along with their code.
+# submitted_at is a naive UTC datetime, or None when it isn't known;
+# event is the key of the event it belongs to (see events.py).
+def build_row(
+    name, age, christian, faith, how_found, country, state, submitted_at=None,
+    event=None,
+):
+    code = state_code(state) if country == "United States" else None
+    if code:
+        state = US_STATE_NAMES[code]
+    return {
+        "Name": name,
+        "Age Range": bin_age(age) if age is not None else None,
+        "Age": age,
+        "Local": checkLocal(state),
+        "Country": country,
+        "State": state,
+        "Christ Follower": christian,
+        "Faith Decicion": faith,
+        "How you found us?": how_found,
+        "State Code": code,
+        "Submitted At": submitted_at,
+        "Event": event,
+    }
+
+
+def missing_fields(row):
+    return [
+        field
+        for field in REQUIRED_FIELDS
+        if row[field] is None or not str(row[field]).strip()
+    ]
+
+
+# What is wrong with the answers in a built row that the database would
+# refuse, as messages. Missing answers are left to missing_fields().
+def invalid_values(row):
+    errors = []
+    age = row["Age"]
+    if age is not None and not MIN_AGE <= age <= MAX_AGE:
+        errors.append(f"Age {age} is not between {MIN_AGE} and {MAX_AGE}")
+    for column in ("Christ Follower", "Faith Decicion"):
+        if row[column] is not None and row[column] not in YES_NO:
+            errors.append(f"{column} {row[column]!r} is not Yes or No")
+    for column, limit in MAX_LENGTHS.items():
+        if isinstance(row.get(column), str) and len(row[column]) > limit:
+            errors.append(f"{column} is longer than {limit} characters")
+    return errors
@@ -0,0 +1,185 @@
+# Optional summary table for the dashboard counts. With SUMMARY_TABLE=true,
+# response_counts(event, dimension, value, count) holds one row per event,
+# chart column and answer, kept in sync by database triggers on every insert, update and
+# delete of responses, and the charts read it instead of grouping the raw
+# rows. Supported on PostgreSQL and SQLite.
+#
+#   python summary_table.py setup     create the table and triggers
+#   python summary_table.py backfill  recount everything from responses
+#   python summary_table.py check     compare against a full recount
+import sys
+
+from sqlalchemy import inspect, text
+
+from aggregates import DIMENSIONS, load_snapshot, scan_snapshot
+
+CREATE_TABLE = """
+CREATE TABLE IF NOT EXISTS response_counts (
+    event VARCHAR(64) NOT NULL,
+    dimension VARCHAR(64) NOT NULL,
+    value VARCHAR(255) NOT NULL,
+    count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (event, dimension, value)
+)
+"""
+
+
+# The NEW or OLD row's event. Rows without one are counted under ''.
+def _event(row):
+    return f"COALESCE({row}.\"Event\", '')"
+
+
+# The stored value for a column of the NEW or OLD row. NULL is stored as ''.
+def _value(row, column):
+    return f"COALESCE(CAST({row}.\"{column}\" AS TEXT), '')"
+
+
+def _sqlite_statements():
+    def increment(row):
+        return "".join(
+            "INSERT INTO response_counts (event, dimension, value, count) "
+            f"VALUES ({_event(row)}, '{c}', {_value(row, c)}, 1) "
+            "ON CONFLICT (event, dimension, value) "
+            "DO UPDATE SET count = count + 1;\n"
+            for c in DIMENSIONS
+        )
+
+    def decrement(row):
+        return "".join(
+            "UPDATE response_counts SET count = count - 1 "
+            f"WHERE event = {_event(row)} AND dimension = '{c}' "
+            f"AND value = {_value(row, c)};\n"
+            for c in DIMENSIONS
+        )
+
+    return [
+        "DROP TRIGGER IF EXISTS response_counts_insert",
+        "DROP TRIGGER IF EXISTS response_counts_delete",
+        "DROP TRIGGER IF EXISTS response_counts_update",
+        "CREATE TRIGGER response_counts_insert AFTER INSERT ON responses "
+        f"BEGIN\n{increment('NEW')}END",
+        "CREATE TRIGGER response_counts_delete AFTER DELETE ON responses "
+        f"BEGIN\n{decrement('OLD')}END",
+        "CREATE TRIGGER response_counts_update AFTER UPDATE ON responses "
+        f"BEGIN\n{decrement('OLD')}{increment('NEW')}END",
+    ]
+
+
+def _postgres_statements():
+    def keys(row):
+        return ", ".join(
+            f"({_event(row)}, '{c}', {_value(row, c)})" for c in DIMENSIONS
+        )
+
+    return [
+        f"""
+        CREATE OR REPLACE FUNCTION response_counts_sync() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP IN ('DELETE', 'UPDATE') THEN
+                UPDATE response_counts SET count = count - 1
+                WHERE (event, dimension, value) IN (VALUES {keys('OLD')});
+            END IF;
+            IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                INSERT INTO response_counts (event, dimension, value, count)
+                SELECT event, dimension, value, 1
+                FROM (VALUES {keys('NEW')}) AS v (event, dimension, value)
+                ON CONFLICT (event, dimension, value)
+                DO UPDATE SET count = response_counts.count + 1;
+            END IF;
+            RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql
+        """,
+        "DROP TRIGGER IF EXISTS response_counts_sync ON responses",
+        "CREATE TRIGGER response_counts_sync "
+        "AFTER INSERT OR UPDATE OR DELETE ON responses "
+        "FOR EACH ROW EXECUTE FUNCTION response_counts_sync()",
+    ]
+
+
+def trigger_statements(dialect):
+    if dialect == "sqlite":
+        return _sqlite_statements()
+    if dialect == "postgresql":
+        return _postgres_statements()
+    raise ValueError(f"Summary table is not supported on {dialect}")
+
+
+# Creates the table and triggers. Backfills if the table is new. A table
+# from before counts were kept per event is replaced.
+def setup(engine):
+    existing = inspect(engine)
+    created = not existing.has_table("response_counts")
+    outdated = not created and "event" not in {
+        c["name"] for c in existing.get_columns("response_counts")
+    }
+    with engine.begin() as conn:
+        if outdated:
+            conn.execute(text("DROP TABLE response_counts"))
+            created = True
+        conn.execute(text(CREATE_TABLE))
+        for statement in trigger_statements(engine.dialect.name):
+            conn.exec_driver_sql(statement)
+    if created:
+        backfill(engine)
+
+
+# Recounts response_counts from scratch in one transaction. On PostgreSQL
+# writes to responses wait until it is done, so no insert is missed.
+def backfill(engine):
+    event = _event("responses")
+    selects = " UNION ALL ".join(
+        f"SELECT {event}, '{c}', {_value('responses', c)}, COUNT(*) "
+        f"FROM responses GROUP BY {event}, {_value('responses', c)}"
+        for c in DIMENSIONS
+    )
+    with engine.begin() as conn:
+        if engine.dialect.name == "postgresql":
+            conn.execute(text("LOCK TABLE responses IN SHARE MODE"))
+        conn.execute(text("DELETE FROM response_counts"))
+        conn.execute(text(
+            f"INSERT INTO response_counts (event, dimension, value, count) {selects}"
+        ))
+
+
+# Differences between the summary table and a full recount, as a list of
+# (event, column, value, summary count, actual count).
+def check(engine):
+    with engine.connect() as conn:
+        keys = conn.execute(text(
+            'SELECT DISTINCT "Event" FROM responses WHERE "Event" IS NOT NULL '
+            "UNION SELECT event FROM response_counts WHERE count > 0 AND event <> ''"
+        )).scalars().all()
+    problems = []
+    for event in keys:
+        summary = load_snapshot(engine, event, use_summary=True)
+        actual = scan_snapshot(engine, event)
+        for column in DIMENSIONS:
+            for value in set(summary[column]) | set(actual[column]):
+                if summary[column][value] != actual[column][value]:
+                    problems.append((
+                        event, column, value,
+                        summary[column][value], actual[column][value],
+                    ))
+    return problems
+
+
+if __name__ == "__main__":
+    from db import engine
+
+    command = sys.argv[1] if len(sys.argv) > 1 else ""
+    if command == "setup":
+        setup(engine)
+        print("response_counts and its triggers are in place.")
+    elif command == "backfill":
+        backfill(engine)
+        print("response_counts recounted.")
+    elif command == "check":
+        problems = check(engine)
+        for event, column, value, summary, actual in problems:
+            print(f"{event} {column}={value!r}: summary {summary}, actual {actual}")
+        print("OK" if not problems else f"{len(problems)} mismatches")
+        sys.exit(1 if problems else 0)
+    else:
+        print("Usage: python summary_table.py setup|backfill|check")
+        sys.exit(1)
@@ -0,0 +1,122 @@
+# Server-side paging, sorting and filtering for the "View Data" table. The
+# DataTable sends its page, sort_by and filter_query to a callback, which
+# turns them into one LIMIT/OFFSET query so only the visible page is read
+# and sent to the browser. Only the given event's rows are shown.
+import math
+import re
+
+from sqlalchemy import text
+
+# page_size comes from the browser; a larger one is cut down to this.
+MAX_PAGE_SIZE = 100
+
+# The operators DataTable writes into filter_query, mapped to SQL.
+COMPARISONS = {
+    "=": "=", "eq": "=",
+    "!=": "!=", "ne": "!=",
+    "<": "<", "lt": "<",
+    "<=": "<=", "le": "<=",
+    ">": ">", "gt": ">",
+    ">=": ">=", "ge": ">=",
+}
+
+FILTER_PATTERN = re.compile(
+    r"^\{(?P<column>[^}]+)\}\s+"
+    r"(?P<op>[si]?(?:contains|datestartswith|eq|ne|lt|le|gt|ge|!=|<=|>=|=|<|>))"
+    r"\s+(?P<value>.+)$"
+)
+
+
+def quote(column):
+    return '"' + column.replace('"', '""') + '"'
+
+
+def parse_value(value):
+    value = value.strip()
+    if len(value) >= 2 and value[0] == value[-1] and value[0] in "\"'`":
+        return value[1:-1]
+    try:
+        return int(value)
+    except ValueError:
+        try:
+            return float(value)
+        except ValueError:
+            return value
+
+
+# Turns filter_query into a WHERE clause and its bound parameters, limited
+# to `event` if one is given. Clauses on unknown columns or that can't be
+# parsed are skipped.
+def build_where(filter_query, columns, event=None):
+    clauses = []
+    params = {}
+    if event is not None:
+        clauses.append('"Event" = :event')
+        params["event"] = event
+    for i, part in enumerate((filter_query or "").split(" && ")):
+        match = FILTER_PATTERN.match(part.strip())
+        if not match or match["column"] not in columns:
+            continue
+
+        column = quote(match["column"])
+        op = match["op"]
+        if op[0] in "si":
+            # Case sensitivity prefix, e.g. "scontains" or "s>"; none of
+            # the operators themselves start with s or i.
+            op = op[1:]
+        value = parse_value(match["value"])
+        name = f"f{i}"
+
+        if op == "contains":
+            clauses.append(f"LOWER(CAST({column} AS TEXT)) LIKE :{name}")
+            params[name] = f"%{str(value).lower()}%"
+        elif op == "datestartswith":
+            clauses.append(f"CAST({column} AS TEXT) LIKE :{name}")
+            params[name] = f"{value}%"
+        else:
+            clauses.append(f"{column} {COMPARISONS[op]} :{name}")
+            params[name] = value
+
+    where = " WHERE " + " AND ".join(clauses) if clauses else ""
+    return where, params
+
+
+# Always ends with the id, so rows that tie on the sort columns (or every
+# row, unsorted) keep one order and LIMIT/OFFSET pages neither repeat nor
+# skip rows.
+def build_order_by(sort_by, columns):
+    terms = [
+        f"{quote(s['column_id'])} {'DESC' if s.get('direction') == 'desc' else 'ASC'}"
+        for s in sort_by or []
+        if s.get("column_id") in columns
+    ]
+    return " ORDER BY " + ", ".join(terms + ['"id"'])
+
+
+# Returns (records for the page, page count).
+def fetch_page(
+    engine, columns, page_current, page_size, sort_by, filter_query, event=None
+):
+    page_size = max(1, min(page_size, MAX_PAGE_SIZE))
+    where, params = build_where(filter_query, columns, event)
+    order_by = build_order_by(sort_by, columns)
+    select = ", ".join(quote(c) for c in columns)
+
+    with engine.connect() as conn:
+        total = conn.execute(
+            text(f"SELECT COUNT(*) FROM responses{where}"), params
+        ).scalar()
+        rows = conn.execute(
+            text(
+                f"SELECT {select} FROM responses{where}{order_by}"
+                " LIMIT :limit OFFSET :offset"
+            ),
+            {
+                **params,
+                "limit": page_size,
+                "offset": (page_current or 0) * page_size,
+            },
+        ).fetchall()
+
+    records = [dict(zip(columns, row)) for row in rows]
+    return records, max(1, math.ceil(total / page_size))
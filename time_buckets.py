@@ -0,0 +1,215 @@
+# Arrivals over time. Every response's "Submitted At" is counted into
+# response_buckets(event, granularity, bucket_start, count) at minute, hour
+# and day granularity, in the same transaction that inserts it (see
+# write_queue and import_csv). The "Over time" chart reads a granularity
+# for an event and the other events of the same name from there, so it
+# costs a primary key range read however many years of responses there
+# are. Buckets are in TIMEZONE (default UTC); "Submitted At" itself is
+# stored in UTC.
+#
+#   python time_buckets.py backfill   recount the buckets from responses
+import os
+import sys
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
+
+from sqlalchemy import (
+    Column,
+    DateTime,
+    Integer,
+    MetaData,
+    String,
+    Table,
+    func,
+    inspect,
+    select,
+    text,
+)
+
+TIMEZONE = ZoneInfo(os.getenv("TIMEZONE", "UTC"))
+GRANULARITIES = ["minute", "hour", "day"]
+BACKFILL_CHUNK_ROWS = 5000
+
+metadata = MetaData()
+
+response_buckets = Table(
+    "response_buckets",
+    metadata,
+    Column("event", String(64), primary_key=True),
+    Column("granularity", String(6), primary_key=True),
+    Column("bucket_start", DateTime, primary_key=True),
+    Column("count", Integer, nullable=False),
+)
+
+
+def utc_now():
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+# "Submitted At" as it comes back from the database, the write spool or a
+# CSV: a datetime, an ISO string or None. Returns a naive UTC datetime, or
+# None if there is no usable value. Times without an offset are UTC.
+def parse_timestamp(value):
+    if value is None or value == "":
+        return None
+    if not isinstance(value, datetime):
+        try:
+            value = datetime.fromisoformat(str(value))
+        except ValueError:
+            return None
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+# The start of the bucket a UTC timestamp falls in, in TIMEZONE.
+def bucket_start(submitted_at, granularity):
+    local = submitted_at.replace(tzinfo=timezone.utc).astimezone(TIMEZONE)
+    local = local.replace(tzinfo=None, second=0, microsecond=0)
+    if granularity == "minute":
+        return local
+    if granularity == "hour":
+        return local.replace(minute=0)
+    return local.replace(hour=0, minute=0)
+
+
+# Rows without an event are not shown anywhere, so aren't counted.
+def count_rows(rows):
+    counts = Counter()
+    for row in rows:
+        event = row.get("Event")
+        submitted_at = parse_timestamp(row.get("Submitted At"))
+        if event is not None and submitted_at is not None:
+            for granularity in GRANULARITIES:
+                start = bucket_start(submitted_at, granularity)
+                counts[event, granularity, start] += 1
+    return counts
+
+
+def _upsert(conn, counts):
+    if not counts:
+        return
+    values = [
+        {"event": event, "granularity": g, "bucket_start": start, "count": n}
+        for (event, g, start), n in counts.items()
+    ]
+    dialect = conn.dialect.name
+    if dialect in ("sqlite", "postgresql"):
+        if dialect == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert
+        statement = insert(response_buckets)
+        statement = statement.on_conflict_do_update(
+            index_elements=["event", "granularity", "bucket_start"],
+            set_={"count": response_buckets.c.count + statement.excluded.count},
+        )
+        conn.execute(statement, values)
+        return
+
+    for value in values:
+        updated = conn.execute(
+            response_buckets.update()
+            .where(response_buckets.c.event == value["event"])
+            .where(response_buckets.c.granularity == value["granularity"])
+            .where(response_buckets.c.bucket_start == value["bucket_start"])
+            .values(count=response_buckets.c.count + value["count"])
+        )
+        if not updated.rowcount:
+            conn.execute(response_buckets.insert(), value)
+
+
+# Counts newly inserted rows (dicts of column name -> value). Called with
+# the connection that inserted them, so both commit together.
+def add_rows(conn, rows):
+    _upsert(conn, count_rows(rows))
+
+
+# Deletes one event's buckets, or every bucket.
+def clear(conn, event=None):
+    statement = response_buckets.delete()
+    if event is not None:
+        statement = statement.where(response_buckets.c.event == event)
+    conn.execute(statement)
+
+
+# Recounts every bucket from responses in one transaction.
+def backfill(engine):
+    with engine.begin() as conn:
+        clear(conn)
+        result = conn.execution_options(
+            stream_results=True, yield_per=BACKFILL_CHUNK_ROWS
+        ).execute(text(
+            'SELECT "Event", "Submitted At" FROM responses '
+            'WHERE "Event" IS NOT NULL AND "Submitted At" IS NOT NULL'
+        ))
+        counts = Counter()
+        for chunk in result.partitions():
+            counts.update(count_rows(
+                {"Event": event, "Submitted At": value} for event, value in chunk
+            ))
+        _upsert(conn, counts)
+
+
+# Creates the table, backfilling it if it is new. A table from before
+# buckets were kept per event is replaced.
+def setup(engine):
+    existing = inspect(engine)
+    created = not existing.has_table("response_buckets")
+    if not created and "event" not in {
+        c["name"] for c in existing.get_columns("response_buckets")
+    }:
+        response_buckets.drop(engine)
+        created = True
+    metadata.create_all(engine)
+    if created:
+        backfill(engine)
+
+
+# Minute buckets for an evening, hours for up to a week, days beyond that.
+def pick_granularity(first, last):
+    span = last - first
+    if span <= timedelta(hours=6):
+        return "minute"
+    if span <= timedelta(days=7):
+        return "hour"
+    return "day"
+
+
+# Returns (granularity, [(bucket start, count), ...]) for the chart of
+# `events`, a list of event keys, with their counts added together.
+def load_series(engine, events):
+    in_event = response_buckets.c.event.in_(events)
+    hours = response_buckets.c.granularity == "hour"
+    with engine.connect() as conn:
+        first, last = conn.execute(
+            select(
+                func.min(response_buckets.c.bucket_start),
+                func.max(response_buckets.c.bucket_start),
+            ).where(in_event, hours)
+        ).one()
+        if first is None:
+            return None, []
+        granularity = pick_granularity(first, last)
+        rows = conn.execute(
+            select(response_buckets.c.bucket_start, func.sum(response_buckets.c.count))
+            .where(in_event)
+            .where(response_buckets.c.granularity == granularity)
+            .where(response_buckets.c.count > 0)
+            .group_by(response_buckets.c.bucket_start)
+            .order_by(response_buckets.c.bucket_start)
+        ).all()
+    return granularity, [tuple(row) for row in rows]
+
+
+if __name__ == "__main__":
+    from db import engine
+
+    if sys.argv[1:] == ["backfill"]:
+        setup(engine)
+        backfill(engine)
+        print("response_buckets recounted.")
+    else:
+        print("Usage: python time_buckets.py backfill")
+        sys.exit(1)
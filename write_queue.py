@@ -0,0 +1,296 @@
+# Write-behind queue for form submissions. submit() appends the row to a
+# spool file on local disk (flushed and fsynced) and returns straight away;
+# a worker thread then inserts spooled rows in batches with one executemany
+# once WRITE_BATCH_SIZE rows are waiting or every WRITE_FLUSH_SECONDS.
+#
+# The spool is the queue: rows are only dropped from disk after their batch
+# has committed, so a crash loses nothing. Each row is spooled with a
+# "Submission ID" (unique in the table), and rows already in the database
+# are skipped, so a batch that committed just before a crash isn't inserted
+# twice on restart. Each process spools to its own files, and on every pass
+# adopts files left behind by processes that have died. What is spooled is
+# written before the process exits.
+#
+# A batch the database rejects (a CHECK or length limit) is retried a row at
+# a time, and rows that still fail are moved to spool/rejected.jsonl with
+# the error, as are spool lines cut short by a crash, so one bad row never
+# holds up the rows behind it.
+#
+# configure() takes two optional hooks, both given the rows of a batch:
+# on_insert(conn, rows) runs inside the batch's transaction, for tables
+# that must commit together with it, and on_flush(rows) after it commits.
+import atexit
+import glob
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+
+from sqlalchemy import column, exc, insert, select, table
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+BATCH_SIZE = int(os.getenv("WRITE_BATCH_SIZE", "50"))
+FLUSH_INTERVAL = float(os.getenv("WRITE_FLUSH_SECONDS", "1"))
+SPOOL_DIR = os.getenv("WRITE_SPOOL_DIR", os.path.join(HERE, "spool"))
+# Not matched by the spool file patterns, so it is never adopted or retried.
+REJECTED_PATH = os.path.join(SPOOL_DIR, "rejected.jsonl")
+ID_COLUMN = "Submission ID"
+
+logger = logging.getLogger(__name__)
+
+_condition = threading.Condition()
+_engine = None
+_on_flush = None
+_on_insert = None
+_worker_pid = None
+_spool = None
+_spooled = 0
+
+
+# Starts the worker straight away, so rows spooled before a crash or
+# restart are written without waiting for the next submission.
+def configure(engine, on_flush=None, on_insert=None):
+    global _engine, _on_flush, _on_insert
+    _engine = engine
+    _on_flush = on_flush
+    _on_insert = on_insert
+    os.makedirs(SPOOL_DIR, exist_ok=True)
+    with _condition:
+        _ensure_worker()
+
+
+# row is a dict of column name -> value for one responses row. Datetimes
+# are spooled as strings, which every backend accepts on insert.
+def submit(row):
+    global _spooled
+    row = {**row, ID_COLUMN: row.get(ID_COLUMN) or str(uuid.uuid4())}
+    line = json.dumps(row, default=str) + "\n"
+    with _condition:
+        _ensure_worker()
+        _spool.write(line)
+        _spool.flush()
+        os.fsync(_spool.fileno())
+        _spooled += 1
+        if _spooled >= BATCH_SIZE:
+            _condition.notify()
+
+
+# Blocks until everything spooled so far has been written. Used by
+# benchmarks and on shutdown.
+def flush():
+    with _condition:
+        if _worker_pid == os.getpid():
+            _rotate()
+    _adopt_orphans()
+    _write_segments()
+
+
+def _flush_at_exit():
+    try:
+        flush()
+    except Exception:
+        logger.exception("Writing spooled rows at exit failed; kept in %s", SPOOL_DIR)
+
+
+atexit.register(_flush_at_exit)
+
+
+def _pending_path(pid):
+    return os.path.join(SPOOL_DIR, f"pending-{pid}.jsonl")
+
+
+def _segment_path(pid):
+    return os.path.join(SPOOL_DIR, f"batch-{pid}-{time.time_ns()}.jsonl")
+
+
+def _segments(pid):
+    return sorted(glob.glob(os.path.join(SPOOL_DIR, f"batch-{pid}-*.jsonl")))
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+# Called with _condition held. Starts the worker in this process, which
+# also covers a fork after the queue was configured.
+def _ensure_worker():
+    global _worker_pid, _spool
+    if _worker_pid == os.getpid():
+        return
+    _worker_pid = os.getpid()
+    _spool = None
+    _adopt_orphans()
+    _rotate()
+    thread = threading.Thread(target=_run, name="write-behind", daemon=True)
+    thread.start()
+
+
+# Renames spool files from dead processes to segments owned by this
+# process. This process's own files (including ones from an earlier run
+# with the same process id) are already picked up by _rotate and
+# _segments.
+def _adopt_orphans():
+    pid = os.getpid()
+    for path in glob.glob(os.path.join(SPOOL_DIR, "*-*.jsonl")):
+        name = os.path.basename(path)
+        owner = int(name.split("-")[1].split(".")[0])
+        if owner == pid or _alive(owner):
+            continue
+        try:
+            os.rename(path, _segment_path(pid))
+        except FileNotFoundError:
+            pass  # another process adopted it first
+
+
+# Called with _condition held. Closes the current spool file as a segment
+# for the worker to write and starts a new one.
+def _rotate():
+    global _spool, _spooled
+    path = _pending_path(os.getpid())
+    if _spool is not None:
+        _spool.close()
+    if os.path.exists(path) and os.path.getsize(path):
+        os.rename(path, _segment_path(os.getpid()))
+    _spool = open(path, "a", encoding="utf-8")
+    _spooled = 0
+
+
+# Nothing restarts this thread, so no error may end it.
+def _run():
+    while True:
+        try:
+            with _condition:
+                _condition.wait_for(
+                    lambda: _spooled >= BATCH_SIZE, timeout=FLUSH_INTERVAL
+                )
+                if _spooled:
+                    _rotate()
+            _adopt_orphans()
+            _write_segments()
+        except Exception:
+            logger.exception("Write-behind pass failed, will retry")
+
+
+_write_lock = threading.Lock()
+
+
+def _reject(error, **record):
+    logger.error(
+        "Rejected a spooled response (%s); kept in %s", error, REJECTED_PATH
+    )
+    with open(REJECTED_PATH, "a", encoding="utf-8") as f:
+        f.write(json.dumps({"error": str(error), **record}) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+
+
+# The rows in a segment. A line that doesn't decode, e.g. cut short by a
+# crash, is rejected. Rows spooled before submission ids get none.
+def _read_segment(path):
+    rows = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            try:
+                rows.append({ID_COLUMN: None, **json.loads(line)})
+            except ValueError as e:
+                _reject(e, line=line)
+    return rows
+
+
+# Inserts the rows not already in the table (a segment replayed after a
+# crash) and returns them.
+def _insert(rows):
+    responses = table("responses", *(column(c) for c in rows[0]))
+    ids = [row[ID_COLUMN] for row in rows if row[ID_COLUMN]]
+    with _engine.begin() as conn:
+        if ids:
+            written = set(
+                conn.scalars(
+                    select(responses.c[ID_COLUMN]).where(
+                        responses.c[ID_COLUMN].in_(ids)
+                    )
+                )
+            )
+            if written:
+                logger.warning("Skipping %d rows already written", len(written))
+                rows = [row for row in rows if row[ID_COLUMN] not in written]
+        if rows:
+            conn.execute(insert(responses), rows)
+            if _on_insert is not None:
+                _on_insert(conn, rows)
+    return rows
+
+
+# Inserts rows one at a time after their batch was rejected, rejecting the
+# ones the database refuses. Returns the rows written. If the database
+# fails for another reason, the rows not yet written are left in the
+# segment to retry and the error is raised.
+def _insert_each(path, rows):
+    written = []
+    for i, row in enumerate(rows):
+        try:
+            written += _insert([row])
+        except (exc.IntegrityError, exc.DataError) as e:
+            _reject(e.orig, row=row)
+        except Exception:
+            _rewrite_segment(path, rows[i:])
+            _flushed(written)
+            raise
+    return written
+
+
+def _rewrite_segment(path, rows):
+    temp = path + ".tmp"
+    with open(temp, "w", encoding="utf-8") as f:
+        for row in rows:
+            f.write(json.dumps(row, default=str) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp, path)
+
+
+# on_flush only updates caches, so a failure there is logged and the rows
+# stay written.
+def _flushed(rows):
+    if rows and _on_flush is not None:
+        try:
+            _on_flush(rows)
+        except Exception:
+            logger.exception("on_flush failed for %d rows", len(rows))
+
+
+# Inserts each of this process's segments, oldest first. A segment that
+# fails for any reason but its data stays on disk and is retried on the
+# next pass, ahead of the segments after it.
+def _write_segments():
+    with _write_lock:
+        for path in _segments(os.getpid()):
+            rows = _read_segment(path)
+            if rows:
+                try:
+                    rows = _insert(rows)
+                except (exc.IntegrityError, exc.DataError):
+                    logger.warning(
+                        "Batch of %d rows rejected, writing them one at a time",
+                        len(rows),
+                    )
+                    try:
+                        rows = _insert_each(path, rows)
+                    except Exception:
+                        logger.exception("Batch insert failed, will retry")
+                        return
+                except Exception:
+                    logger.exception("Batch insert failed, will retry")
+                    return
+            os.remove(path)
+            _flushed(rows)
@@ -0,0 +1,56 @@
+# Production entry point: the app run by gunicorn as several worker
+# processes, each with a few threads. Settings are in gunicorn.conf.py.
+#
+#   CACHE_BACKEND=filesystem LAZY_INIT=false gunicorn wsgi:server
+#   WEB_WORKERS=8 WEB_THREADS=4 PORT=8000 gunicorn wsgi:server
+#
+# Give every worker the same cache (shared_cache.py): CACHE_BACKEND=
+# filesystem with one CACHE_DIR for workers on one machine, or
+# CACHE_BACKEND=redis with REDIS_URL for several machines. The workers then
+# share the chart counts and their versions, the rendered charts and the
+# refreshed country list, so each is worked out by one worker and served by
+# all, and /live/responses sees submissions made through any worker. With
+# the default memory backend each worker keeps its own.
+#
+# WEB_WORKERS defaults to one per CPU, which is about right: chart building
+# is CPU work, so workers beyond the CPU count only contend for it.
+# `python benchmark.py workers` measures throughput by worker count on the
+# machine it runs on.
+#
+# Charts are built on the request thread by default, so a slow query holds
+# up one of the worker's WEB_THREADS until it finishes. BACKGROUND_CHARTS=
+# true is the opt-in non-blocking path: chart callbacks run as background
+# jobs in their own processes and the page shows a spinner meanwhile. It
+# needs dash[diskcache] and one of the shared cache backends above.
+#
+# LAZY_INIT=false also preloads the app: imports, the schema check and the
+# first count load happen once in the gunicorn master before it forks the
+# workers. What stays per worker process:
+#   - the database connection pool, opened afresh after the fork (db.py):
+#     DB_POOL_SIZE per worker, so size the database's connection limit for
+#     WEB_WORKERS x (DB_POOL_SIZE + DB_MAX_OVERFLOW), or use
+#     DB_EXTERNAL_POOLER
+#   - the write-behind spool files (write_queue.py); keep WRITE_SPOOL_DIR on
+#     local disk that the workers share, so a restarted worker adopts what
+#     a dead one left behind
+#   - the drill-down cubes (cube.py) and the cached event list (events.py)
+#   - /metrics, which reports the worker that answers it
+#
+# `python wsgi.py` runs the same app on Flask's development server.
+import importlib.util
+import os
+import sys
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "EasterDash0.1.py")
+
+# EasterDash0.1.py isn't importable by name.
+spec = importlib.util.spec_from_file_location("easterdash", APP_PATH)
+easterdash = importlib.util.module_from_spec(spec)
+sys.modules["easterdash"] = easterdash
+spec.loader.exec_module(easterdash)
+
+app = easterdash.app
+server = application = easterdash.server
+
+if __name__ == "__main__":
+    app.run(host="0.0.0.0", port=int(os.environ.get("PORT", 8050)))